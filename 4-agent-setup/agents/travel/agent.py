@@ -4,14 +4,15 @@ Travel agent implementation.
 This module defines the travel agent with its models, tools, and chain configuration.
 """
 
+import os
 from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_openai_tools_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 from utils.logger import logger
-from utils.conversation import load_conversation
+from utils.conversation import initialize_conversation_chain
 from utils.vector import initialize_vector_store, initialize_embedding_model
-from agents.travel.tools import get_city_weather, get_city_info, get_city_fallback_info
+from utils.catalog import initialize_catalog
+from agents.travel.tools import get_city_weather, get_city_info, get_city_fallback_info, search_travel_guides
+from agents.travel.tools.guides import KNOWLEDGE_PERSIST_DIRECTORY, KNOWLEDGE_COLLECTION
 from agents.travel.prompts import TRAVEL_SYSTEM_PROMPT, TRAVEL_WELCOME_MESSAGE
 
 def initialize_llm(temperature=0.7, model="gpt-3.5-turbo", streaming=True):
@@ -26,54 +27,23 @@ def initialize_llm(temperature=0.7, model="gpt-3.5-turbo", streaming=True):
 def initialize_travel_tools():
     """Initialize the tools for the travel agent."""
     logger.info("Initializing travel tools")
-    tools = [get_city_weather, get_city_info, get_city_fallback_info]
+    tools = [search_travel_guides, get_city_weather, get_city_info, get_city_fallback_info]
     return tools
 
-def create_travel_agent(llm, conversation_store, session_id, system_prompt):
-    """Create a travel agent with the LLM, tools, and conversation context.
+def create_travel_agent(llm, system_prompt):
+    """Return the travel agent executor built on llm.
+
+    The executor is shared by all sessions through the resource registry. The conversation's context summary
+    and recalled history are passed with the messages on every invoke.
 
     Args:
         llm: The language model instance
-        conversation_store: The vector store for conversations
-        session_id: The current session ID
         system_prompt: The system prompt to use
 
     Returns:
         An agent executor instance ready to process messages
     """
-    logger.info("Creating travel agent")
-    tools = initialize_travel_tools()
-
-    # Load existing conversation or get defaults
-    conversation_data = load_conversation(conversation_store, session_id)
-
-    # Format the system prompt with the conversation data
-    formatted_prompt = system_prompt.format(
-        history=conversation_data["messages"],
-        context=conversation_data["context_summary"]
-    )
-
-    # Create a prompt with messages placeholder for the agent
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", formatted_prompt),
-        MessagesPlaceholder(variable_name="messages"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
-
-    # Create the agent with tools
-    agent = create_openai_tools_agent(llm, tools, prompt)
-
-    # Create the agent executor
-    agent_executor = AgentExecutor(
-        agent=agent,
-        tools=tools,
-        verbose=True,
-        max_iterations=3,
-        handle_parsing_errors=True,
-    )
-
-    logger.info("🤖 Travel agent created successfully")
-    return agent_executor
+    return initialize_conversation_chain(llm, system_prompt, initialize_travel_tools())
 
 def get_initializer():
     return {
@@ -83,14 +53,21 @@ def get_initializer():
         "system_prompt": TRAVEL_SYSTEM_PROMPT,
         "welcome_message": TRAVEL_WELCOME_MESSAGE,
         "embedding_model": initialize_embedding_model,
+        "embedding_provider": os.getenv("EMBEDDING_PROVIDER", "openai"),
         "conversation_store": {
             "initialize": initialize_vector_store,
             "persist_directory": "conversation_store",
             "collection_name": "conversations",
+            "backend": os.getenv("CONVERSATION_STORE_BACKEND", "chroma"),
+        },
+        "conversation_catalog": {
+            "initialize": initialize_catalog,
+            "path": "conversation_store/catalog.sqlite3",
         },
         "knowledge_store": {
             "initialize": initialize_vector_store,
-            "persist_directory": "knowledge_store",
-            "collection_name": "knowledge",
+            "persist_directory": KNOWLEDGE_PERSIST_DIRECTORY,
+            "collection_name": KNOWLEDGE_COLLECTION,
+            "backend": os.getenv("KNOWLEDGE_STORE_BACKEND", "chroma"),
         }
     }
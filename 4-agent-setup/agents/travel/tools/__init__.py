@@ -6,5 +6,6 @@ This package contains tools specific to the travel agent.
 
 from .weather import get_city_weather
 from .city_info import get_city_info, get_city_fallback_info
+from .guides import search_travel_guides
 
-__all__ = ['get_city_weather', 'get_city_info', 'get_city_fallback_info']
+__all__ = ['get_city_weather', 'get_city_info', 'get_city_fallback_info', 'search_travel_guides']
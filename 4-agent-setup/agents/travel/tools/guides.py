@@ -0,0 +1,75 @@
+import os
+import threading
+from langchain.tools import tool
+
+from utils.logger import logger
+from utils.vector import initialize_vector_store, initialize_embedding_model, vector_store_key
+from utils.resources import get_resource_registry
+
+# Where ingest_knowledge.py writes the travel guides
+KNOWLEDGE_PERSIST_DIRECTORY = "knowledge_store"
+KNOWLEDGE_COLLECTION = "knowledge"
+
+# Guide passages returned per search
+GUIDE_TOP_K = int(os.getenv("GUIDE_TOP_K", "4"))
+
+# Passages less relevant than this are not returned
+GUIDE_MIN_RELEVANCE = float(os.getenv("GUIDE_MIN_RELEVANCE", "0.5"))
+
+_knowledge_store = None
+_knowledge_store_lock = threading.Lock()
+
+def get_knowledge_store():
+    """Return the knowledge store, shared with the sessions through the resource registry."""
+    global _knowledge_store
+    with _knowledge_store_lock:
+        if _knowledge_store is None:
+            backend = os.getenv("KNOWLEDGE_STORE_BACKEND", "chroma")
+            provider = os.getenv("EMBEDDING_PROVIDER", "openai")
+            registry = get_resource_registry()
+            # The tool holds its reference for the life of the process
+            _knowledge_store = registry.acquire(
+                vector_store_key(KNOWLEDGE_PERSIST_DIRECTORY, KNOWLEDGE_COLLECTION, backend, provider),
+                lambda: initialize_vector_store(
+                    registry.acquire(("embedding_model", provider), lambda: initialize_embedding_model(provider)),
+                    KNOWLEDGE_PERSIST_DIRECTORY,
+                    KNOWLEDGE_COLLECTION,
+                    backend
+                )
+            )
+        return _knowledge_store
+
+@tool
+def search_travel_guides(query: str, city: str = "") -> str:
+    """Search our curated travel guides. Use this first for questions about a city,
+    before the other city tools.
+
+    Args:
+        query: What to look for, e.g. "best food markets" or "museums for kids".
+        city: Optional city name to restrict the search to that city's guides.
+
+    Returns:
+        The most relevant guide passages with their sources, or a note that none were found.
+    """
+    logger.info(f"📚 Searching travel guides for '{query}'" + (f" in {city}" if city else ""))
+
+    try:
+        where = {"city": city.strip().lower()} if city.strip() else None
+        results = get_knowledge_store().similarity_search_with_relevance_scores(
+            f"{city} {query}".strip(), k=GUIDE_TOP_K, filter=where
+        )
+    except Exception as e:
+        logger.error(f"Error searching travel guides: {str(e)}")
+        return "The travel guides are unavailable right now. Use the other city tools instead."
+
+    passages = []
+    for doc, score in results:
+        if score < GUIDE_MIN_RELEVANCE:
+            continue
+        source = doc.metadata.get("source", "guide")
+        passages.append(f"### {doc.metadata.get('title', source)} ({source})\n{doc.page_content.strip()}")
+
+    logger.info(f"✅ Found {len(passages)} guide passages")
+    if not passages:
+        return f"No guide information found for this{' in ' + city if city else ''}. Use the other city tools instead."
+    return "\n\n".join(passages)
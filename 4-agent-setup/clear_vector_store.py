@@ -1,17 +1,33 @@
 import os
+import time
 import shutil
+import sqlite3
+import argparse
+from contextlib import closing
 from dotenv import load_dotenv
 import logging
 
+from utils.store_lock import STORE_LOCK_FILE, exclusive_store_lock
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+VECTOR_STORES = ['conversation_store', 'knowledge_store']
+
+# Where store snapshots are kept, one folder per snapshot name
+SNAPSHOTS_DIRECTORY = os.getenv("STORE_SNAPSHOTS_DIRECTORY", "store_snapshots")
+
+# Snapshot that `reset` restores
+BASELINE_SNAPSHOT = os.getenv("BASELINE_SNAPSHOT", "baseline")
+
 def clear_vector_stores():
-    """Clear all vector stores by removing their directories"""
-    vector_stores = ['conversation_store', 'knowledge_store']
+    """Clear all vector stores by removing their directories; refused while the app has them open"""
+    with exclusive_store_lock(VECTOR_STORES, "clear the stores"):
+        _remove_stores()
 
-    for store in vector_stores:
+def _remove_stores():
+    for store in VECTOR_STORES:
         if os.path.exists(store):
             logger.info(f"Removing vector store: {store}")
             shutil.rmtree(store)
@@ -21,7 +37,134 @@ def clear_vector_stores():
 
     logger.info("All vector stores cleared")
 
+def copy_store(source, destination):
+    """Copy a store directory; SQLite databases are copied with the backup API.
+
+    Chroma's index segments and the NumPy store's files are plain copies, so
+    the callers hold the stores' exclusive lock: the app must be stopped.
+    """
+    def copy_file(src, dst):
+        if src.endswith((".sqlite3", ".db")):
+            with closing(sqlite3.connect(src)) as src_conn, closing(sqlite3.connect(dst)) as dst_conn:
+                src_conn.backup(dst_conn)
+        elif not src.endswith(("-wal", "-shm", STORE_LOCK_FILE)):
+            shutil.copy2(src, dst)
+
+    shutil.copytree(source, destination, copy_function=copy_file)
+
+def snapshot_vector_stores(name):
+    """Copy the current stores into a named snapshot.
+
+    Refused while the app has a store open: Chroma's index files are not
+    copied consistently while it writes.
+    """
+    with exclusive_store_lock(VECTOR_STORES, "take a snapshot"):
+        _snapshot_stores(name)
+
+def _snapshot_stores(name):
+    target = os.path.join(SNAPSHOTS_DIRECTORY, name)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    start = time.perf_counter()
+    for store in VECTOR_STORES:
+        if os.path.exists(store):
+            copy_store(store, os.path.join(staging, store))
+            logger.info(f"Copied {store} into snapshot {name}")
+        else:
+            logger.info(f"Vector store {store} does not exist, skipping")
+
+    # Replace an older snapshot with the same name only once the new one is complete
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.rename(staging, target)
+    logger.info(f"Snapshot {name} saved in {time.perf_counter() - start:.1f}s")
+
+def restore_vector_stores(name):
+    """Replace the current stores with the contents of a named snapshot.
+
+    Refused while the app has a store open: open stores keep using the files
+    they already opened.
+    """
+    with exclusive_store_lock(VECTOR_STORES, "restore a snapshot"):
+        _restore_stores(name)
+
+def _restore_stores(name):
+    source = os.path.join(SNAPSHOTS_DIRECTORY, name)
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"No snapshot named {name} in {SNAPSHOTS_DIRECTORY}")
+
+    start = time.perf_counter()
+    for store in VECTOR_STORES:
+        snapshot_store = os.path.join(source, store)
+        if not os.path.exists(snapshot_store):
+            # The store was empty when the snapshot was taken
+            if os.path.exists(store):
+                shutil.rmtree(store)
+            continue
+
+        # Copy next to the store, then swap, so a failed copy leaves the store untouched
+        staging = f"{store}.restore"
+        shutil.rmtree(staging, ignore_errors=True)
+        copy_store(snapshot_store, staging)
+        if os.path.exists(store):
+            old = f"{store}.old"
+            shutil.rmtree(old, ignore_errors=True)
+            os.rename(store, old)
+            os.rename(staging, store)
+            shutil.rmtree(old)
+        else:
+            os.rename(staging, store)
+        logger.info(f"Restored {store} from snapshot {name}")
+
+    logger.info(f"Snapshot {name} restored in {time.perf_counter() - start:.1f}s")
+
+def reset_vector_stores():
+    """Reset the stores to the baseline snapshot, or clear them if there is none"""
+    with exclusive_store_lock(VECTOR_STORES, "reset the stores"):
+        if os.path.isdir(os.path.join(SNAPSHOTS_DIRECTORY, BASELINE_SNAPSHOT)):
+            _restore_stores(BASELINE_SNAPSHOT)
+        else:
+            logger.info(f"No {BASELINE_SNAPSHOT} snapshot found, clearing the stores instead")
+            _remove_stores()
+
+def list_snapshots():
+    """Names of the saved snapshots"""
+    if not os.path.isdir(SNAPSHOTS_DIRECTORY):
+        return []
+    return sorted(
+        name for name in os.listdir(SNAPSHOTS_DIRECTORY)
+        if os.path.isdir(os.path.join(SNAPSHOTS_DIRECTORY, name)) and not name.endswith(".tmp")
+    )
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clear, snapshot, restore or reset the vector stores.")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("clear", help="Remove the stores (default)")
+    snapshot = subcommands.add_parser("snapshot", help="Copy the stores into a named snapshot")
+    snapshot.add_argument("name", nargs="?", default=BASELINE_SNAPSHOT)
+    restore = subcommands.add_parser("restore", help="Replace the stores with a named snapshot")
+    restore.add_argument("name")
+    subcommands.add_parser("reset", help=f"Restore the {BASELINE_SNAPSHOT} snapshot, or clear if there is none")
+    subcommands.add_parser("list", help="List the saved snapshots")
+    return parser.parse_args()
+
 if __name__ == "__main__":
     load_dotenv()
-    clear_vector_stores()
-    logger.info("Vector stores cleanup complete. The application will start with fresh stores on next run.")
+    args = parse_args()
+
+    if args.command == "snapshot":
+        snapshot_vector_stores(args.name)
+    elif args.command == "restore":
+        restore_vector_stores(args.name)
+        logger.info("Vector stores restored. Restart the application to use them.")
+    elif args.command == "reset":
+        reset_vector_stores()
+        logger.info("Vector stores reset. Restart the application to use them.")
+    elif args.command == "list":
+        for name in list_snapshots():
+            print(name)
+    else:
+        clear_vector_stores()
+        logger.info("Vector stores cleanup complete. The application will start with fresh stores on next run.")
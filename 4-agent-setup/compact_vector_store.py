@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import argparse
+import datetime
+from collections import defaultdict
+from dotenv import load_dotenv
+import logging
+
+import chromadb
+
+from utils.vector import resolve_collection_name, set_collection_alias
+from utils.catalog import initialize_catalog
+from utils.store_lock import exclusive_store_lock
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+LATENCY_SAMPLES = 20
+
+# Retired collections written to more recently than this are kept until a later run
+RETIRED_GRACE_MINUTES = float(os.getenv("RETIRED_COLLECTION_GRACE_MINUTES", "10"))
+
+def directory_size(path):
+    """Total size in bytes of the files under path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def iter_record_pages(collection, with_embeddings=False):
+    """Yield the records of a collection one page at a time"""
+    include = ["documents", "metadatas"] + (["embeddings"] if with_embeddings else [])
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=PAGE_SIZE, offset=offset)
+        records = [
+            {
+                "id": record_id,
+                "document": page["documents"][i],
+                "metadata": page["metadatas"][i] or {},
+                "embedding": page["embeddings"][i] if with_embeddings else None,
+            }
+            for i, record_id in enumerate(page["ids"])
+        ]
+        if records:
+            yield records
+        if len(records) < PAGE_SIZE:
+            return
+        offset += PAGE_SIZE
+
+def embedding_dimension(collection):
+    page = collection.get(limit=1, include=["embeddings"])
+    return len(page["embeddings"][0]) if len(page["ids"]) else 0
+
+def record_bytes(record, dimension):
+    """Approximate stored size of a record: document, metadata and float32 embedding"""
+    return (
+        len((record["document"] or "").encode("utf-8"))
+        + len(json.dumps(record["metadata"]).encode("utf-8"))
+        + 4 * dimension
+    )
+
+def write_records(client, collection, records):
+    """Add records (with their stored embeddings) in the largest batches the client accepts"""
+    batch_size = client.get_max_batch_size()
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        collection.upsert(
+            ids=[r["id"] for r in batch],
+            documents=[r["document"] for r in batch],
+            metadatas=[r["metadata"] for r in batch],
+            embeddings=[r["embedding"] for r in batch]
+        )
+
+def record_session(record):
+    return record["metadata"].get("session_id", record["id"])
+
+def group_sessions(collection):
+    """Each session's record count, user, last activity and approximate size, read page by page"""
+    dimension = embedding_dimension(collection)
+    sessions = defaultdict(lambda: {"records": 0, "timestamp": "", "user_id": None, "bytes": 0})
+    for page in iter_record_pages(collection):
+        for record in page:
+            metadata = record["metadata"]
+            session = sessions[record_session(record)]
+            session["records"] += 1
+            session["timestamp"] = max(session["timestamp"], metadata.get("timestamp", ""))
+            session["user_id"] = session["user_id"] or metadata.get("user_id")
+            session["bytes"] += record_bytes(record, dimension)
+    return sessions
+
+def apply_retention(sessions, max_age_days=None, max_sessions_per_user=None, max_total_mb=None):
+    """Return the ids of the sessions to evict under the retention policies"""
+    evicted = set()
+
+    if max_age_days is not None:
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat()
+        evicted.update(sid for sid, s in sessions.items() if s["timestamp"] and s["timestamp"] < cutoff)
+
+    newest_first = sorted(
+        (sid for sid in sessions if sid not in evicted),
+        key=lambda sid: sessions[sid]["timestamp"],
+        reverse=True
+    )
+
+    if max_sessions_per_user is not None:
+        kept_per_user = defaultdict(int)
+        for sid in newest_first:
+            user = sessions[sid]["user_id"] or "default"
+            kept_per_user[user] += 1
+            if kept_per_user[user] > max_sessions_per_user:
+                evicted.add(sid)
+
+    if max_total_mb is not None:
+        budget = max_total_mb * 1024 * 1024
+        used = 0
+        for sid in newest_first:
+            if sid in evicted:
+                continue
+            used += sessions[sid]["bytes"]
+            if used > budget:
+                evicted.add(sid)
+
+    return evicted
+
+def copy_survivors(client, source, target, evicted):
+    """Copy the records of the sessions not evicted, page by page with their embeddings.
+
+    Returns:
+        The number of records copied and a few of their embeddings for latency sampling
+    """
+    copied = 0
+    samples = []
+    for page in iter_record_pages(source, with_embeddings=True):
+        survivors = [r for r in page if record_session(r) not in evicted]
+        write_records(client, target, survivors)
+        copied += len(survivors)
+        samples.extend(r["embedding"] for r in survivors[:LATENCY_SAMPLES - len(samples)])
+    return copied, samples
+
+def measure_query_latency(collection, sample_embeddings):
+    """Median latency in milliseconds of nearest-neighbour queries on a collection"""
+    if not sample_embeddings or collection.count() == 0:
+        return 0.0
+    timings = []
+    for embedding in sample_embeddings:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[embedding], n_results=5)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return round(timings[len(timings) // 2], 2)
+
+def collection_stats(collection):
+    """Last write time (ISO) and approximate size in bytes of a collection, read page by page"""
+    dimension = embedding_dimension(collection)
+    last_write = ""
+    size = 0
+    for page in iter_record_pages(collection):
+        for record in page:
+            last_write = max(last_write, record["metadata"].get("timestamp", ""))
+            size += record_bytes(record, dimension)
+    return last_write, size
+
+def drop_retired_collections(client, collection_name, active_name, grace_minutes=RETIRED_GRACE_MINUTES):
+    """Drop the collections retired by earlier compactions.
+
+    A collection written to within the last grace_minutes is kept for a later
+    run. Collections newer than the active one were built by a compaction that
+    failed before switching the alias and are always dropped.
+
+    Returns:
+        The names of the dropped collections and the approximate bytes held by the kept ones
+    """
+    recent = (datetime.datetime.now() - datetime.timedelta(minutes=grace_minutes)).isoformat()
+    dropped = []
+    pending_bytes = 0
+    for collection in client.list_collections():
+        name = collection if isinstance(collection, str) else collection.name
+        if name == active_name or not (name == collection_name or name.startswith(f"{collection_name}__")):
+            continue
+        if name > active_name:
+            # Built by a compaction that failed before switching the alias; never served
+            client.delete_collection(name)
+            dropped.append(name)
+            logger.info(f"Dropped unused collection {name}")
+            continue
+
+        last_write, size = collection_stats(client.get_collection(name))
+        if last_write > recent:
+            logger.info(f"Keeping retired collection {name}: written to at {last_write}, less than {grace_minutes:g} minutes ago")
+            pending_bytes += size
+            continue
+        client.delete_collection(name)
+        dropped.append(name)
+        logger.info(f"Dropped retired collection {name}")
+    return dropped, pending_bytes
+
+def vacuum(persist_directory):
+    """Shrink Chroma's SQLite file"""
+    import sqlite3
+    path = os.path.join(persist_directory, "chroma.sqlite3")
+    if not os.path.exists(path):
+        return
+    try:
+        conn = sqlite3.connect(path, timeout=5)
+        conn.execute("VACUUM")
+        conn.close()
+    except sqlite3.OperationalError as e:
+        logger.warning(f"VACUUM skipped: {e}")
+
+def reclaim(client, persist_directory, collection_name, active_name):
+    """Drop retired collections and vacuum; returns the bytes freed on disk and the bytes still pending"""
+    size_before = directory_size(persist_directory)
+    dropped, pending_bytes = drop_retired_collections(client, collection_name, active_name)
+    if dropped:
+        vacuum(persist_directory)
+    return size_before - directory_size(persist_directory), pending_bytes
+
+def compact_vector_store(persist_directory="conversation_store", collection_name="conversations",
+                         catalog_path="conversation_store/catalog.sqlite3", max_age_days=None,
+                         max_sessions_per_user=None, max_total_mb=None, drop_old=False, dry_run=False):
+    """Evict sessions by retention policy and rebuild the collection and its index.
+
+    The app must be stopped: Chroma does not support a second client on a
+    live store, so the store directory is locked for the whole run. The
+    surviving records are copied page by page with their stored embeddings
+    (no re-embedding) into a new collection, and the collection alias is
+    switched to it. The old collection is dropped on the next run, or at
+    the end of this one with drop_old, once it is past the grace period.
+    """
+    with exclusive_store_lock([persist_directory], "compact the store"):
+        return _compact(persist_directory, collection_name, catalog_path, max_age_days,
+                        max_sessions_per_user, max_total_mb, drop_old, dry_run)
+
+def _compact(persist_directory, collection_name, catalog_path, max_age_days,
+             max_sessions_per_user, max_total_mb, drop_old, dry_run):
+    size_before = directory_size(persist_directory)
+    client = chromadb.PersistentClient(path=persist_directory)
+
+    active_name = resolve_collection_name(persist_directory, collection_name)
+    report = {
+        "collection": collection_name,
+        "source_collection": active_name,
+        "dry_run": dry_run,
+        "bytes_before": size_before,
+    }
+    if not dry_run:
+        recovered, _ = reclaim(client, persist_directory, collection_name, active_name)
+        report["bytes_recovered"] = recovered
+    source = client.get_collection(active_name)
+
+    sessions = group_sessions(source)
+    evicted = apply_retention(sessions, max_age_days, max_sessions_per_user, max_total_mb)
+    records_before = sum(s["records"] for s in sessions.values())
+    records_evicted = sum(sessions[sid]["records"] for sid in evicted)
+    logger.info(
+        f"{records_before} records in {len(sessions)} sessions; evicting {len(evicted)} sessions "
+        f"({records_evicted} records)"
+    )
+    report.update({
+        "records_before": records_before,
+        "records_after": records_before - records_evicted,
+        "sessions_evicted": len(evicted),
+    })
+    if dry_run:
+        return report
+
+    # Rebuild into a fresh collection with the same settings (distance function etc.)
+    target_name = f"{collection_name}__{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}"
+    target = client.create_collection(target_name, metadata=source.metadata)
+    report["records_after"], samples = copy_survivors(client, source, target, evicted)
+
+    report["query_ms_before"] = measure_query_latency(source, samples)
+    report["query_ms_after"] = measure_query_latency(target, samples)
+
+    set_collection_alias(persist_directory, collection_name, target_name)
+    report["active_collection"] = target_name
+    logger.info(f"Collection {collection_name} now served by {target_name}")
+
+    if evicted and catalog_path:
+        catalog = initialize_catalog(catalog_path)
+        for session_id in evicted:
+            catalog.delete(session_id)
+
+    if drop_old:
+        recovered, pending_bytes = reclaim(client, persist_directory, collection_name, target_name)
+        report["bytes_recovered"] += recovered
+    else:
+        pending_bytes = collection_stats(source)[1]
+    # The retired collection's space is only freed on disk once it is dropped
+    report["bytes_pending_reclaim"] = pending_bytes
+    report["bytes_after"] = directory_size(persist_directory)
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compact the conversation store and evict old sessions.")
+    parser.add_argument("--persist-directory", default="conversation_store")
+    parser.add_argument("--collection", default="conversations")
+    parser.add_argument("--catalog", default="conversation_store/catalog.sqlite3")
+    parser.add_argument("--max-age-days", type=float, help="Evict sessions inactive for longer than this")
+    parser.add_argument("--max-sessions-per-user", type=int, help="Keep only the newest N sessions per user")
+    parser.add_argument("--max-total-mb", type=float, help="Keep the newest sessions up to this total size")
+    parser.add_argument("--drop-old", action="store_true", help="Drop the old collection at the end of this run instead of on the next one")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be evicted")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parse_args()
+    report = compact_vector_store(
+        persist_directory=args.persist_directory,
+        collection_name=args.collection,
+        catalog_path=args.catalog,
+        max_age_days=args.max_age_days,
+        max_sessions_per_user=args.max_sessions_per_user,
+        max_total_mb=args.max_total_mb,
+        drop_old=args.drop_old,
+        dry_run=args.dry_run
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,183 @@
+import os
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import logging
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from utils.vector import initialize_vector_store, initialize_embedding_model, save_documents_to_store, get_documents_from_store
+from agents.travel.tools.guides import KNOWLEDGE_PERSIST_DIRECTORY, KNOWLEDGE_COLLECTION
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+GUIDE_EXTENSIONS = (".md", ".txt")
+
+def find_guides(source_directory):
+    """List the guide files under a directory, as paths relative to it"""
+    guides = []
+    for root, _, files in os.walk(source_directory):
+        for name in sorted(files):
+            if name.lower().endswith(GUIDE_EXTENSIONS):
+                guides.append(os.path.relpath(os.path.join(root, name), source_directory))
+    return sorted(guides)
+
+def guide_city(relative_path):
+    """The city a guide is about: its folder (paris/food.md) or its file name (paris.md)"""
+    parts = relative_path.replace("\\", "/").split("/")
+    name = parts[0] if len(parts) > 1 else os.path.splitext(parts[0])[0]
+    return name.replace("_", " ").replace("-", " ").strip().lower()
+
+def guide_title(text, relative_path):
+    """The first markdown heading of a guide, or its file name"""
+    for line in text.splitlines():
+        if line.startswith("#"):
+            return line.lstrip("#").strip()
+    return os.path.splitext(os.path.basename(relative_path))[0].replace("_", " ").title()
+
+def chunk_guide(source_directory, relative_path, splitter):
+    """Read and split one guide into (content, metadata, id) items"""
+    with open(os.path.join(source_directory, relative_path), "r", encoding="utf-8") as f:
+        text = f.read()
+
+    content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    metadata = {
+        "source": relative_path,
+        "city": guide_city(relative_path),
+        "title": guide_title(text, relative_path),
+        "content_hash": content_hash,
+    }
+    chunks = splitter.split_text(text)
+    return content_hash, [
+        (chunk, {**metadata, "chunk": i}, f"{relative_path}:{i}")
+        for i, chunk in enumerate(chunks)
+    ]
+
+def ingested_hashes(knowledge_store):
+    """Content hash of every guide already in the store, by source path"""
+    results = get_documents_from_store(knowledge_store, {"chunk": 0}, include=["metadatas"])
+    if not results:
+        return {}
+    return {m["source"]: m.get("content_hash") for m in results["metadatas"] if m and "source" in m}
+
+def save_in_batches(knowledge_store, items, workers, batch_size):
+    """Save items in batches on several workers; returns one status per item, in order"""
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [status for batch in pool.map(
+            lambda batch: save_documents_to_store(knowledge_store, batch, batch_size), batches
+        ) for status in batch]
+
+def ingest_knowledge(source_directory, workers=4, batch_size=100, chunk_size=1000, chunk_overlap=150,
+                     backend="chroma", prune=False):
+    """Fill the knowledge store from a directory of travel guides.
+
+    Guides are read and split in parallel. Guides whose content is unchanged
+    since the last run are skipped and changed ones replace their old chunks.
+    The chunks are embedded and written in batches by several workers.
+
+    Chunk 0 carries the content hash that marks a guide as ingested, so it is
+    written only once all the other chunks of its guide are saved. A guide
+    with a failed chunk keeps its old hash (or none) and is retried on the
+    next run; its old chunks beyond the new chunk count are deleted only then.
+    """
+    start = time.perf_counter()
+    knowledge_store = initialize_vector_store(
+        initialize_embedding_model(), KNOWLEDGE_PERSIST_DIRECTORY, KNOWLEDGE_COLLECTION, backend
+    )
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    guides = find_guides(source_directory)
+    logger.info(f"Found {len(guides)} guides in {source_directory}")
+    existing = ingested_hashes(knowledge_store)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        chunked = list(pool.map(lambda path: chunk_guide(source_directory, path, splitter), guides))
+
+    first_chunks, other_chunks = [], []
+    chunk_counts = {}
+    skipped = 0
+    for relative_path, (content_hash, guide_items) in zip(guides, chunked):
+        if existing.get(relative_path) == content_hash or not guide_items:
+            skipped += 1
+            continue
+        chunk_counts[relative_path] = len(guide_items)
+        first_chunks.append(guide_items[0])
+        other_chunks.extend(guide_items[1:])
+
+    logger.info(f"Ingesting {len(first_chunks) + len(other_chunks)} chunks ({skipped} unchanged guides skipped)")
+    statuses = save_in_batches(knowledge_store, other_chunks, workers, batch_size)
+    incomplete = {metadata["source"] for (_, metadata, _), saved in zip(other_chunks, statuses) if not saved}
+
+    # Mark the guides whose other chunks all saved as ingested
+    completing = [item for item in first_chunks if item[1]["source"] not in incomplete]
+    first_statuses = save_in_batches(knowledge_store, completing, workers, batch_size)
+    statuses.extend(first_statuses)
+    completed = [item[1]["source"] for item, saved in zip(completing, first_statuses) if saved]
+    incomplete.update(item[1]["source"] for item, saved in zip(completing, first_statuses) if not saved)
+
+    # Drop the chunks a shorter new version of a guide no longer has
+    for relative_path in completed:
+        if relative_path in existing:
+            knowledge_store.delete(where={"$and": [
+                {"source": relative_path},
+                {"chunk": {"$gte": chunk_counts[relative_path]}},
+            ]})
+    if incomplete:
+        logger.warning(f"{len(incomplete)} guides had chunks that failed to save and will be retried next run")
+
+    current = set(guides)
+    removed = [path for path in existing if path not in current]
+    if prune:
+        for relative_path in removed:
+            knowledge_store.delete(where={"source": relative_path})
+
+    report = {
+        "guides": len(guides),
+        "skipped": skipped,
+        "ingested": len(completed),
+        "incomplete": len(incomplete),
+        "chunks": len(first_chunks) + len(other_chunks),
+        "saved": sum(statuses),
+        "failed": len(statuses) - sum(statuses),
+        "pruned": len(removed) if prune else 0,
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+    logger.info(f"Ingestion complete: {report}")
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load travel guides into the knowledge store.")
+    parser.add_argument("source", help="Directory of .md/.txt guides (one file or folder per city)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel embedding/write workers")
+    parser.add_argument("--batch-size", type=int, default=100, help="Chunks per embedding request")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "sqlite", "numpy"],
+                        help="Store backend to write to; snapshots are published from it with --publish-snapshot")
+    parser.add_argument("--prune", action="store_true", help="Remove guides that are no longer in the source directory")
+    parser.add_argument("--publish-snapshot", action="store_true", help="Publish a snapshot of the store afterwards")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parse_args()
+    ingest_knowledge(
+        args.source,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        backend=args.backend,
+        prune=args.prune
+    )
+    if args.publish_snapshot:
+        from utils.snapshot import publish_snapshot, snapshot_directory
+        source = initialize_vector_store(
+            initialize_embedding_model(), KNOWLEDGE_PERSIST_DIRECTORY, KNOWLEDGE_COLLECTION, args.backend
+        )
+        publish_snapshot(source, snapshot_directory(KNOWLEDGE_PERSIST_DIRECTORY, KNOWLEDGE_COLLECTION))
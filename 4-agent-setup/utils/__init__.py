@@ -4,7 +4,18 @@ Utilities package for the City Explorer AI application.
 This package contains modules for:
 - Logging setup and configuration (logger.py)
 - Vector store operations (vector.py)
+- Vector store backend interface (store_base.py)
+- SQLite conversation store backend (sqlite_store.py)
+- In-process NumPy vector store backend (numpy_store.py)
+- Memory-mapped vector store snapshots (snapshot.py)
+- Process locks on store directories (store_lock.py)
+- Offline hashing embeddings (local_embeddings.py)
 - Conversation management (conversation.py)
+- Saved conversation catalog (catalog.py)
+- Message serialization (serialization.py)
+- Background conversation persistence (persistence.py)
+- Long-term memory recall (memory.py)
+- Shared resource registry (resources.py)
 - Streamlit UI helpers (streamlit.py)
 - Agent initialization and management (agent.py)
 - Message processing utilities (messaging.py)
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+
+from utils.logger import logger
+
+class ConversationCatalog:
+    """Compact index of saved conversations used to list them in the sidebar.
+
+    One row per session (session_id, title, timestamp, message_count) in a
+    SQLite file, indexed by timestamp so pages of the most recent conversations
+    can be read without touching the conversation store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                session_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS conversations_recent ON conversations (timestamp DESC, session_id DESC)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        """Return this thread's connection (Streamlit runs each session in its own thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, session_id, title, timestamp, message_count):
+        """Add or update the catalog entry of a session."""
+        conn = self._connection()
+        conn.execute(
+            """
+            INSERT INTO conversations (session_id, title, timestamp, message_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                title = excluded.title,
+                timestamp = excluded.timestamp,
+                message_count = excluded.message_count
+            """,
+            (session_id, title, timestamp, message_count)
+        )
+        conn.commit()
+
+    def delete(self, session_id):
+        """Remove a session from the catalog."""
+        conn = self._connection()
+        conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+    def count(self):
+        """Number of conversations in the catalog."""
+        return self._connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def list(self, limit=10, cursor=None):
+        """Return a page of conversations, most recent first.
+
+        Args:
+            limit: Maximum number of conversations to return
+            cursor: The next_cursor of the previous page, or None for the first page
+
+        Returns:
+            A (conversations, next_cursor) tuple; next_cursor is None on the last page
+        """
+        query = "SELECT session_id, title, timestamp, message_count FROM conversations"
+        params = []
+        if cursor:
+            # Keyset pagination: continue strictly after the last row of the previous page
+            timestamp, session_id = cursor.split("|", 1)
+            query += " WHERE (timestamp, session_id) < (?, ?)"
+            params.extend([timestamp, session_id])
+        query += " ORDER BY timestamp DESC, session_id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._connection().execute(query, params).fetchall()
+        conversations = [
+            {"id": row[0], "title": row[1], "timestamp": row[2], "message_count": row[3]}
+            for row in rows[:limit]
+        ]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = conversations[-1]
+            next_cursor = f"{last['timestamp']}|{last['id']}"
+        return conversations, next_cursor
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def initialize_catalog(path="conversation_store/catalog.sqlite3"):
+    """Return the conversation catalog stored at path, shared within the process."""
+    with _catalogs_lock:
+        if path not in _catalogs:
+            _catalogs[path] = ConversationCatalog(path)
+            logger.info(f"📇 Initialized conversation catalog: {path}")
+        return _catalogs[path]
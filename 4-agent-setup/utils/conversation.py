@@ -1,4 +1,6 @@
+import os
 import uuid
+import hashlib
 import datetime
 from langchain.schema import SystemMessage, AIMessage, HumanMessage
 from langchain.prompts import ChatPromptTemplate
@@ -6,9 +8,16 @@ from langchain.schema.output_parser import StrOutputParser
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from utils.logger import logger
-from utils.vector import save_document_to_store, get_documents_from_store
+from utils.vector import save_document_to_store, save_documents_to_store, get_documents_from_store
+from utils.serialization import ENCODING_VERSION, encode_message, decode_message, decode_messages
 
-def create_context_summary(messages, llm):
+# Rolling summaries are fully re-summarized once they grow past this many characters
+SUMMARY_CHAR_BUDGET = int(os.getenv("SUMMARY_CHAR_BUDGET", "2000"))
+
+# Context given to the agent for a conversation that has not been saved yet
+NEW_CONVERSATION_CONTEXT = "This is a new conversation."
+
+def create_context_summary(messages, llm, max_chars=SUMMARY_CHAR_BUDGET):
     """Create a summary of the conversation to use as context for future interactions"""
     prompt = ChatPromptTemplate.from_template(
         """
@@ -22,15 +31,285 @@ def create_context_summary(messages, llm):
         Here is the conversation history:
         {messages}
 
-        Please provide a concise summary of the key points.
+        Please provide a concise summary of the key points, in less than {max_chars} characters.
         """
     )
     chain = prompt | llm | StrOutputParser()
-    summary = chain.invoke({"messages": messages})
+    summary = chain.invoke({"messages": messages, "max_chars": max_chars})
     return summary
 
-def save_conversation(conversation_store, llm, messages, session_id=None):
-    """Save the current conversation to the vector store"""
+def update_context_summary(summary, new_messages, llm, max_chars=SUMMARY_CHAR_BUDGET):
+    """Fold new messages into an existing conversation summary"""
+    prompt = ChatPromptTemplate.from_template(
+        """
+        You are a helpful assistant that keeps a running summary of a conversation. You help our travel assistant remember the conversation history.
+        The summary should cover:
+        1. Which cities the user has mentioned
+        2. Any specific interests the user has expressed
+        3. Travel plans or timeframes mentioned
+        4. Any specific questions that were asked about those cities
+
+        Here is the current summary:
+        {summary}
+
+        Here are the new messages since that summary:
+        {messages}
+
+        Please return the updated summary, concise and covering both, in less than {max_chars} characters.
+        """
+    )
+    chain = prompt | llm | StrOutputParser()
+    return chain.invoke({"summary": summary, "messages": new_messages, "max_chars": max_chars})
+
+def _fit_summary(summary, max_chars=SUMMARY_CHAR_BUDGET):
+    """Cut a summary that is still over budget back to max_chars, at a word boundary."""
+    if len(summary) <= max_chars:
+        return summary
+    logger.warning(f"🧾 Summary still over budget ({len(summary)} > {max_chars} chars), truncating it")
+    return summary[:max_chars].rsplit(None, 1)[0]
+
+def _rolling_context_summary(header, entries, llm):
+    """Return (summary, high-water mark) for the first len(entries) messages.
+
+    Only the messages after the stored summary's high-water mark are sent to the
+    LLM. The whole transcript is re-summarized when there is no usable previous
+    summary or when the rolled summary exceeds SUMMARY_CHAR_BUDGET; that
+    summary is truncated if needed, so the next save can fold into it again.
+    """
+    previous = header.get("context_summary") if header else None
+    summarized = header.get("summary_message_count", 0) if header else 0
+
+    if previous and 0 < summarized == len(entries):
+        return previous, summarized
+
+    # A summary stored over budget (e.g. before the budget was lowered) is re-made, not folded into
+    if previous and 0 < summarized < len(entries) and len(previous) <= SUMMARY_CHAR_BUDGET:
+        logger.info(f"🧾 Folding {len(entries) - summarized} new messages into the summary")
+        summary = update_context_summary(previous, _format_transcript(entries[summarized:]), llm)
+        if len(summary) <= SUMMARY_CHAR_BUDGET:
+            return summary, len(entries)
+        logger.info(f"🧾 Summary over budget ({len(summary)} > {SUMMARY_CHAR_BUDGET} chars), re-summarizing")
+
+    return _fit_summary(create_context_summary(_format_transcript(entries), llm)), len(entries)
+
+def _message_record_id(session_id, seq):
+    """Id of the message record with the given sequence number."""
+    return f"{session_id}:msg:{seq:06d}"
+
+def _session_record_id(session_id):
+    """Id of the session header record."""
+    return f"{session_id}:session"
+
+def _conversation_entries(messages):
+    """Return the storable messages of a conversation, in order.
+
+    System messages are left out, as are AI messages with neither content nor tool calls.
+    """
+    entries = []
+    for m in messages:
+        if isinstance(m, SystemMessage):
+            continue
+        if isinstance(m, AIMessage) and not _message_text(m).strip() and not getattr(m, "tool_calls", None):
+            continue
+        entries.append(m)
+    return entries
+
+def _message_text(message):
+    """Plain text of a message, used for transcripts and as the embedded document."""
+    return message.content if isinstance(message.content, str) else str(message.content)
+
+def _entry_hash(entry):
+    """Fingerprint of a stored message, used to check the saved log is still a prefix."""
+    return hashlib.sha1(encode_message(entry).encode("utf-8")).hexdigest()
+
+def _format_transcript(entries):
+    """Format messages as a "User: ... / Assistant: ..." transcript."""
+    lines = []
+    for m in entries:
+        text = _message_text(m).strip()
+        if isinstance(m, HumanMessage):
+            lines.append(f"User: {text}")
+        elif isinstance(m, AIMessage) and text:
+            lines.append(f"Assistant: {text}")
+    return "\n\n".join(lines)
+
+def _get_session_header(conversation_store, session_id):
+    """Return the header metadata of a session, or None if it uses no message log."""
+    results = get_documents_from_store(
+        conversation_store,
+        {"$and": [{"session_id": session_id}, {"record_type": "session"}]},
+        include=["metadatas"],
+        limit=1
+    )
+    if results and results.get('metadatas'):
+        return results['metadatas'][0]
+    return None
+
+def _read_message_records(conversation_store, session_id, start=0, end=None):
+    """Read the contiguous range [start, end) of a session's message log, ordered by seq."""
+    clauses = [
+        {"session_id": session_id},
+        {"record_type": "message"},
+        {"seq": {"$gte": start}},
+    ]
+    if end is not None:
+        clauses.append({"seq": {"$lt": end}})
+
+    results = get_documents_from_store(conversation_store, {"$and": clauses})
+    if not results or not results.get('ids'):
+        return []
+
+    records = sorted(zip(results['metadatas'], results['documents']), key=lambda r: r[0]["seq"])
+
+    # Encoded records are decoded in one pass; records written before the
+    # structured encoding only have a role and the message text
+    if all("payload" in metadata for metadata, _ in records):
+        return decode_messages([metadata["payload"] for metadata, _ in records])
+
+    messages = []
+    for metadata, document in records:
+        if "payload" in metadata:
+            messages.append(decode_message(metadata["payload"]))
+        elif metadata.get("role") == "user":
+            messages.append(HumanMessage(content=document))
+        else:
+            messages.append(AIMessage(content=document))
+    return messages
+
+def _append_message_records(conversation_store, session_id, entries, start_seq, timestamp, user_id=None):
+    """Append messages to the session's message log; returns the new log length."""
+    items = []
+    for offset, message in enumerate(entries):
+        seq = start_seq + offset
+        metadata = {
+            "record_type": "message",
+            "session_id": session_id,
+            "seq": seq,
+            "role": message.type,
+            "timestamp": timestamp,
+            "encoding": ENCODING_VERSION,
+            "payload": encode_message(message),
+        }
+        if user_id:
+            metadata["user_id"] = user_id
+        # The message text is the embedded document; tool-call-only messages get their tool names
+        text = _message_text(message) or ", ".join(call["name"] for call in getattr(message, "tool_calls", []))
+        items.append((text or message.type, metadata, _message_record_id(session_id, seq)))
+
+    # The log must stay contiguous, so it ends before the first message that failed to save
+    statuses = save_documents_to_store(conversation_store, items)
+    for offset, saved in enumerate(statuses):
+        if not saved:
+            logger.warning(f"Stopped appending at message {start_seq + offset}")
+            return start_seq + offset
+    return start_seq + len(entries)
+
+def _migrate_legacy_session(conversation_store, session_id, metadata, messages):
+    """Rewrite a legacy single-document transcript as an encoded message log.
+
+    The legacy summary is kept as the rolling summary, so no LLM call is needed.
+    """
+    try:
+        entries = _conversation_entries(messages)
+        if not entries:
+            return
+        timestamp = metadata.get("timestamp") or datetime.datetime.now().isoformat()
+        stored_count = _append_message_records(conversation_store, session_id, entries, 0, timestamp)
+        if stored_count != len(entries):
+            return
+
+        first_user = next((_message_text(m) for m in entries if isinstance(m, HumanMessage)), "")
+        title = first_user[:30] + ("..." if len(first_user) > 30 else "") if first_user else "Conversation"
+        header = {
+            "record_type": "session",
+            "session_id": session_id,
+            "title": title,
+            "context_summary": metadata.get("context_summary", ""),
+            "timestamp": timestamp,
+            "message_count": stored_count,
+            "user_message_count": sum(1 for m in entries if isinstance(m, HumanMessage)),
+            "last_message_hash": _entry_hash(entries[-1]),
+            "summary_message_count": stored_count,
+        }
+        if save_document_to_store(conversation_store, title, header, _session_record_id(session_id)):
+            _delete_legacy_records(conversation_store, session_id)
+            logger.info(f"🔁 Migrated legacy conversation {session_id[:8]}... to the message log")
+    except Exception as e:
+        logger.warning(f"Could not migrate legacy conversation {session_id[:8]}...: {e}")
+
+def _delete_legacy_records(conversation_store, session_id):
+    """Remove a session's old single-document transcript, superseded by the message log."""
+    # Legacy transcripts carry a message count, message records don't
+    results = get_documents_from_store(
+        conversation_store,
+        {"$and": [{"session_id": session_id}, {"message_count": {"$gte": 0}}]},
+        include=["metadatas"]
+    )
+    if not results or not results.get('ids'):
+        return
+    legacy_ids = [
+        doc_id for doc_id, metadata in zip(results['ids'], results['metadatas'])
+        if metadata and "record_type" not in metadata
+    ]
+    if legacy_ids:
+        logger.info(f"🧹 Replacing legacy transcript of {session_id[:8]}... with a message log")
+        conversation_store.delete(ids=legacy_ids)
+
+def _parse_legacy_transcript(messages_text):
+    """Parse an old "User: ... / Assistant: ..." transcript into message objects."""
+    parsed_messages = []
+
+    # Split by line but preserve message boundaries
+    lines = messages_text.split("\n")
+    i = 0
+
+    while i < len(lines):
+        line = lines[i].strip()
+
+        if not line:
+            i += 1
+            continue
+
+        if line.startswith("User: "):
+            # User messages are typically single line
+            content = line[6:]
+            parsed_messages.append(HumanMessage(content=content))
+            logger.info(f"Added user message: {content[:30]}...")
+            i += 1
+
+        elif line.startswith("Assistant: "):
+            # AI messages can span multiple lines due to markdown
+            content = line[11:]  # Start with first line content
+            i += 1
+
+            # Continue collecting lines until we hit the next message marker
+            while i < len(lines) and not (lines[i].startswith("User: ") or lines[i].startswith("Assistant: ")):
+                content += "\n" + lines[i]
+                i += 1
+
+            # Only add if there's actual content
+            if content.strip():
+                parsed_messages.append(AIMessage(content=content))
+                logger.info(f"Added AI message: {content[:30]}... (length: {len(content)})")
+        else:
+            # Skip unrecognized lines
+            logger.warning(f"Skipping unrecognized line: {line[:30]}...")
+            i += 1
+
+    return parsed_messages
+
+def save_conversation(conversation_store, llm, messages, session_id=None, catalog=None, user_id=None):
+    """Save the current conversation to the vector store.
+
+    Messages are kept as an append-only log, one record per message with a
+    sequence number, plus a small session header. A save only writes the
+    messages added since the last save and rewrites the header. When a
+    catalog is given, the session's catalog entry is updated too. Records are
+    tagged with user_id so long-term memory can recall them across sessions.
+
+    Raises RuntimeError if some messages or the session header could not be
+    saved; the messages that were saved stay in the log for the next save.
+    """
     logger.info("💾 Saving conversation")
 
     if not session_id:
@@ -42,85 +321,131 @@ def save_conversation(conversation_store, llm, messages, session_id=None):
         logger.info("⏭️ No user messages to save, skipping")
         return session_id
 
-    # Check if this conversation already exists
-    try:
-        results = get_documents_from_store(conversation_store, {"session_id": session_id})
+    entries = _conversation_entries(messages)
 
-        # If this conversation exists and has the same message count, don't save again
-        if results and results.get('metadatas') and len(results['metadatas']) > 0:
-            existing_count = results['metadatas'][0].get("message_count", 0)
-            current_count = len(messages)
+    # Skip saving if there are no messages to save
+    if not entries:
+        logger.warning("No valid messages to save, skipping")
+        return session_id
 
-            if existing_count == current_count:
-                logger.info(f"✅ Conversation already saved (messages: {existing_count})")
-                return session_id
+    # Find how much of the conversation is already in the log
+    stored_count = 0
+    header = None
+    try:
+        header = _get_session_header(conversation_store, session_id)
+
+        if header:
+            stored_count = header.get("message_count", 0)
 
-            # Delete the old version before saving the new one
-            logger.info(f"🔄 Updating conversation from {existing_count} to {current_count} messages")
-            conversation_store.delete(
-                where={"session_id": session_id}
+            # The saved log must still be a prefix of the conversation, otherwise rewrite it
+            diverged = stored_count > len(entries) or (
+                stored_count > 0 and header.get("last_message_hash") != _entry_hash(entries[stored_count - 1])
             )
+            if diverged:
+                logger.info("🔄 Conversation no longer matches the saved log, rewriting it")
+                conversation_store.delete(where={"session_id": session_id})
+                stored_count = 0
+                header = None
+            elif stored_count == len(entries):
+                logger.info(f"✅ Conversation already saved (messages: {stored_count})")
+                return session_id
+        else:
+            _delete_legacy_records(conversation_store, session_id)
     except Exception as e:
         logger.warning(f"Error checking for existing conversation: {e}")
 
-    # Convert message objects to strings for the context summary
-    message_texts = []
+    # Append only the new turns
+    timestamp = datetime.datetime.now().isoformat()
+    new_entries = entries[stored_count:]
+    logger.info(f"📝 Appending {len(new_entries)} new messages to the log (already stored: {stored_count})")
+    stored_count = _append_message_records(conversation_store, session_id, new_entries, stored_count, timestamp, user_id)
 
-    for m in messages:
-        if isinstance(m, HumanMessage):
-            message_texts.append(f"User: {m.content}")
-        elif isinstance(m, AIMessage) and not isinstance(m.content, dict) and m.content.strip():
-            # Save AI messages with a special marker at the start to preserve markdown
-            # This ensures we properly delimit messages even if they contain newlines
-            ai_content = m.content.strip()
-            message_texts.append(f"Assistant: {ai_content}")
-            # Log the size of content being saved
-            logger.info(f"Saving AI message of length {len(ai_content)} characters")
+    if stored_count == 0:
+        raise RuntimeError("No messages could be saved")
 
-    messages_str = "\n\n".join(message_texts)  # Double newline to better separate messages
+    # Update the rolling summary of the conversation for context
+    context_summary, summary_count = _rolling_context_summary(header, entries[:stored_count], llm)
 
-    # Skip saving if there are no messages to save
-    if not message_texts:
-        logger.warning("No valid messages to save, skipping")
-        return session_id
-
-    # Generate a summary of the conversation for context
-    context_summary = create_context_summary(messages_str, llm)
+    # Use the first user message as the title
+    title = header.get("title") if header else None
+    if not title:
+        first_user = next((_message_text(m) for m in entries if isinstance(m, HumanMessage)), "")
+        title = first_user[:30] + ("..." if len(first_user) > 30 else "") if first_user else "Conversation"
 
-    # Create a document with the conversation content
-    content_text = " ".join([m.content[:100] for m in messages if not isinstance(m, SystemMessage) and not isinstance(m.content, dict)])
-
-    # Create metadata with all necessary information
     metadata = {
+        "record_type": "session",
         "session_id": session_id,
-        "messages": messages_str,
+        "title": title,
         "context_summary": context_summary,
-        "timestamp": datetime.datetime.now().isoformat(),
-        "message_count": len(messages),
+        "timestamp": timestamp,
+        "message_count": stored_count,
         "user_message_count": user_msgs,
+        "last_message_hash": _entry_hash(entries[stored_count - 1]),
+        "summary_message_count": summary_count,
     }
+    if user_id:
+        metadata["user_id"] = user_id
+    if not save_document_to_store(conversation_store, title, metadata, _session_record_id(session_id)):
+        raise RuntimeError("The session header could not be saved")
+
+    if catalog is not None:
+        try:
+            catalog.upsert(session_id, title, timestamp, stored_count)
+        except Exception as e:
+            logger.warning(f"Error updating conversation catalog: {e}")
 
-    # Add to vector store
-    save_document_to_store(conversation_store, content_text, metadata)
+    if stored_count < len(entries):
+        raise RuntimeError(f"Only {stored_count} of {len(entries)} messages could be saved")
 
     logger.info(f"✅ Conversation saved successfully (ID: {session_id[:8]}...)")
     return session_id
 
+def get_conversation_page(catalog, limit=10, cursor=None):
+    """Get a page of saved conversations from the catalog, most recent first.
+
+    Returns a (conversations, next_cursor) tuple, see ConversationCatalog.list.
+    """
+    try:
+        conversations, next_cursor = catalog.list(limit=limit, cursor=cursor)
+        logger.info(f"📚 Listed {len(conversations)} saved conversations from the catalog")
+        return conversations, next_cursor
+    except Exception as e:
+        logger.error(f"Error reading conversation catalog: {e}")
+        return [], None
+
+def rebuild_catalog(catalog, conversation_store):
+    """Fill the catalog from the conversations already in the store."""
+    conversations = get_saved_conversations(conversation_store)
+    for conv in conversations:
+        catalog.upsert(conv["id"], conv["title"], conv["timestamp"], conv["message_count"])
+    logger.info(f"📇 Rebuilt conversation catalog with {len(conversations)} conversations")
+    return len(conversations)
+
 def get_saved_conversations(conversation_store):
-    """Get a list of saved conversations from the store"""
+    """Get a list of saved conversations by scanning the store.
+
+    This reads every session from the store; the sidebar uses the catalog
+    (get_conversation_page) instead.
+    """
     try:
-        # Get all documents from the store
-        results = get_documents_from_store(conversation_store)
+        # Session headers and legacy transcripts carry a message count, message records don't
+        results = get_documents_from_store(conversation_store, {"message_count": {"$gte": 0}}, include=["metadatas"])
 
         if not results or not results.get('metadatas') or not results.get('ids'):
             return []
 
-        conversations = []
-        for i, metadata in enumerate(results['metadatas']):
+        conversations = {}
+        for metadata in results['metadatas']:
             if metadata and "session_id" in metadata and "timestamp" in metadata:
-                # Extract the first user message for the title, if available
+                is_header = metadata.get("record_type") == "session"
+                if not is_header and metadata["session_id"] in conversations:
+                    continue
+
                 title = "Conversation"
-                if "messages" in metadata:
+                if is_header:
+                    title = metadata.get("title") or title
+                elif "messages" in metadata:
+                    # Extract the first user message of a legacy transcript for the title
                     messages = metadata["messages"].split("\n")
                     for msg in messages:
                         if msg.startswith("User: "):
@@ -128,15 +453,15 @@ def get_saved_conversations(conversation_store):
                             title = msg[6:36] + ("..." if len(msg) > 36 else "")
                             break
 
-                conversations.append({
+                conversations[metadata["session_id"]] = {
                     "id": metadata["session_id"],
                     "title": title,
                     "timestamp": metadata["timestamp"],
                     "message_count": metadata.get("message_count", 0)
-                })
+                }
 
         # Sort by timestamp, most recent first
-        conversations.sort(key=lambda x: x["timestamp"], reverse=True)
+        conversations = sorted(conversations.values(), key=lambda x: x["timestamp"], reverse=True)
         logger.info(f"📚 Found {len(conversations)} saved conversations")
         return conversations
 
@@ -144,10 +469,36 @@ def get_saved_conversations(conversation_store):
         logger.error(f"Error retrieving saved conversations: {e}")
         return []
 
+def load_context_summary(conversation_store, session_id):
+    """Load only the context summary of a conversation, without its messages"""
+    try:
+        header = _get_session_header(conversation_store, session_id)
+        if header and header.get("context_summary"):
+            return header["context_summary"]
+    except Exception as e:
+        logger.error(f"Error loading context summary: {e}")
+        return "Error loading previous conversation."
+    return load_conversation(conversation_store, session_id)["context_summary"]
+
 def load_conversation(conversation_store, session_id):
     """Load a conversation from the store or return defaults if not found"""
     try:
-        results = get_documents_from_store(conversation_store, {"session_id": session_id})
+        header = _get_session_header(conversation_store, session_id)
+        if header:
+            entries = _read_message_records(conversation_store, session_id, 0, header.get("message_count", 0))
+            logger.info(f"📂 Loaded conversation data for: {session_id[:8]}...")
+            return {
+                "messages": _format_transcript(entries),
+                "context_summary": header.get("context_summary", "")
+            }
+
+        # Fall back to a legacy single-document transcript
+        results = get_documents_from_store(
+            conversation_store,
+            {"$and": [{"session_id": session_id}, {"message_count": {"$gte": 0}}]},
+            include=["metadatas"],
+            limit=1
+        )
 
         if results and results.get('metadatas') and len(results['metadatas']) > 0:
             metadata = results['metadatas'][0]
@@ -161,7 +512,7 @@ def load_conversation(conversation_store, session_id):
         # Return default values if conversation not found or doesn't have expected structure
         return {
             "messages": "",
-            "context_summary": "This is a new conversation."
+            "context_summary": NEW_CONVERSATION_CONTEXT
         }
     except Exception as e:
         logger.error(f"Error loading conversation: {e}")
@@ -173,87 +524,67 @@ def load_conversation(conversation_store, session_id):
 def load_conversation_messages(conversation_store, session_id, system_prompt, welcome_message):
     """Load the messages for a specific conversation as message objects"""
     try:
-        results = get_documents_from_store(conversation_store, {"session_id": session_id})
+        # Convert the stored messages back to message objects
+        parsed_messages = [SystemMessage(content=system_prompt)]
 
-        if not results or not results.get('metadatas') or len(results['metadatas']) == 0:
-            logger.warning(f"❓ No conversation found with ID: {session_id[:8]}...")
-            return None
+        header = _get_session_header(conversation_store, session_id)
+        if header:
+            parsed_messages.extend(
+                _read_message_records(conversation_store, session_id, 0, header.get("message_count", 0))
+            )
+        else:
+            # Fall back to a legacy single-document transcript
+            results = get_documents_from_store(
+                conversation_store,
+                {"$and": [{"session_id": session_id}, {"message_count": {"$gte": 0}}]},
+                include=["metadatas"],
+                limit=1
+            )
 
-        metadata = results['metadatas'][0]
-        if "messages" in metadata:
-            messages_text = metadata["messages"]
-            logger.info(f"Raw messages from store:\n{messages_text[:200]}..." if len(messages_text) > 200 else messages_text)
+            if not results or not results.get('metadatas') or len(results['metadatas']) == 0:
+                logger.warning(f"❓ No conversation found with ID: {session_id[:8]}...")
+                return None
 
-            # Convert text back to message objects
-            parsed_messages = [SystemMessage(content=system_prompt)]
+            metadata = results['metadatas'][0]
+            if "messages" not in metadata:
+                logger.warning("No messages found in conversation metadata")
+                return None
 
-            # Split by line but preserve message boundaries
-            lines = messages_text.split("\n")
-            i = 0
+            messages_text = metadata["messages"]
+            logger.info(f"Raw messages from store:\n{messages_text[:200]}..." if len(messages_text) > 200 else messages_text)
+            legacy_messages = _parse_legacy_transcript(messages_text)
+            parsed_messages.extend(legacy_messages)
 
-            while i < len(lines):
-                line = lines[i].strip()
+            # Lazily move the session to the encoded message log
+            _migrate_legacy_session(conversation_store, session_id, metadata, legacy_messages)
 
-                if not line:
-                    i += 1
-                    continue
+        # If we only have the system message, add the welcome message
+        if len(parsed_messages) == 1:
+            parsed_messages.append(AIMessage(content=welcome_message))
+            logger.info("Added welcome message as no valid messages were found")
 
-                if line.startswith("User: "):
-                    # User messages are typically single line
-                    content = line[6:]
-                    parsed_messages.append(HumanMessage(content=content))
-                    logger.info(f"Added user message: {content[:30]}...")
-                    i += 1
-
-                elif line.startswith("Assistant: "):
-                    # AI messages can span multiple lines due to markdown
-                    content = line[11:]  # Start with first line content
-                    i += 1
-
-                    # Continue collecting lines until we hit the next message marker
-                    while i < len(lines) and not (lines[i].startswith("User: ") or lines[i].startswith("Assistant: ")):
-                        content += "\n" + lines[i]
-                        i += 1
-
-                    # Only add if there's actual content
-                    if content.strip():
-                        parsed_messages.append(AIMessage(content=content))
-                        logger.info(f"Added AI message: {content[:30]}... (length: {len(content)})")
-                else:
-                    # Skip unrecognized lines
-                    logger.warning(f"Skipping unrecognized line: {line[:30]}...")
-                    i += 1
-
-            # If we only have the system message, add the welcome message
-            if len(parsed_messages) == 1:
-                parsed_messages.append(AIMessage(content=welcome_message))
-                logger.info("Added welcome message as no valid messages were found")
-
-            # Debug output
-            logger.info(f"Loaded {len(parsed_messages)} messages in total")
-            return parsed_messages
-
-        logger.warning("No messages found in conversation metadata")
-        return None
+        # Debug output
+        logger.info(f"Loaded {len(parsed_messages)} messages in total")
+        return parsed_messages
 
     except Exception as e:
         logger.error(f"Error loading conversation messages: {e}")
         return None
 
-def initialize_conversation_chain(llm, conversation_store, session_id, system_prompt, tools):
-    """Initialize the conversation chain with previous context and tools if available"""
-    # Load existing conversation or get defaults
-    conversation_data = load_conversation(conversation_store, session_id)
-
-    # Format the system prompt with the conversation data
-    formatted_prompt = system_prompt.format(
-        history=conversation_data["messages"],
-        context=conversation_data["context_summary"]
-    )
-
-    # Create a prompt with messages placeholder for the agent
+def initialize_conversation_chain(llm, system_prompt, tools):
+    """Build the agent executor for an LLM, a system prompt and tools.
+
+    The executor holds no session state: the conversation's context summary,
+    the recalled history and the messages are passed on every invoke, e.g.
+    {"messages": ..., "history": ..., "context": ...}. Sessions share it
+    through the resource registry (see initialize_session_state), so starting
+    a conversation builds nothing, and it is dropped with the LLM it was
+    built for once the last session holding them ends.
+    """
+    # Create a prompt with messages placeholder for the agent. The history
+    # and context variables of the system prompt are supplied on every invoke.
     prompt = ChatPromptTemplate.from_messages([
-        ("system", formatted_prompt),
+        ("system", system_prompt),
         MessagesPlaceholder(variable_name="messages"),
         MessagesPlaceholder(variable_name="agent_scratchpad"),
     ])
@@ -0,0 +1,59 @@
+import re
+import math
+import zlib
+from langchain_core.embeddings import Embeddings
+
+# Size of the hashed feature space, i.e. the embedding dimension
+HASHING_DIMENSIONS = 512
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+class HashingEmbeddings(Embeddings):
+    """Local, deterministic embeddings built by feature hashing.
+
+    Words, word bigrams and character trigrams are hashed (CRC32, so the
+    result does not depend on the process) into a fixed number of signed
+    buckets, weighted by sublinear term frequency and L2-normalized. No model
+    or network is needed and thousands of texts are embedded per second, so
+    the whole app can run and be benchmarked offline. Similarity is lexical,
+    not semantic: use it for tests, benchmarks and development.
+    """
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS, char_ngram_weight=0.5):
+        self.dimensions = dimensions
+        self.char_ngram_weight = char_ngram_weight
+
+    def _features(self, text):
+        words = _TOKEN_PATTERN.findall(text.lower())
+        counts = {}
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1.0
+        for first, second in zip(words, words[1:]):
+            bigram = f"{first} {second}"
+            counts[bigram] = counts.get(bigram, 0) + 1.0
+        for word in words:
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                trigram = "#" + padded[i:i + 3]
+                counts[trigram] = counts.get(trigram, 0) + self.char_ngram_weight
+        return counts
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for feature, count in self._features(text).items():
+            hashed = zlib.crc32(feature.encode("utf-8"))
+            # The top bit picks the sign, so collisions tend to cancel out
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            weight = 1.0 + math.log(count) if count >= 1 else count
+            vector[hashed % self.dimensions] += sign * weight
+
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm:
+            vector = [value / norm for value in vector]
+        return vector
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
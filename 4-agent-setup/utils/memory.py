@@ -0,0 +1,74 @@
+import os
+from utils.logger import logger
+from utils.messaging import count_tokens
+
+# Token budget for the memories added to the system prompt
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "500"))
+
+# Number of past turns retrieved before applying the budget
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "8"))
+
+# Turns less relevant than this are never recalled
+MEMORY_MIN_RELEVANCE = float(os.getenv("MEMORY_MIN_RELEVANCE", "0.3"))
+
+# Long turns (usually itineraries) are cut to this many characters
+MEMORY_SNIPPET_CHARS = 400
+
+NO_MEMORIES = "No relevant past conversations."
+
+def recall_memories(conversation_store, query, user_id, exclude_session_id=None, k=None, max_tokens=None):
+    """Recall the past turns most relevant to a question, across a user's sessions.
+
+    Searches the embedded message records of the user's other sessions and
+    keeps the most relevant ones that fit in the token budget.
+
+    Args:
+        conversation_store: The vector store for conversations
+        query: The user's current question
+        user_id: Only this user's messages are searched; None (no trusted
+            identity) recalls nothing
+        exclude_session_id: Session to leave out, usually the current one
+        k: Number of turns to retrieve, MEMORY_TOP_K by default
+        max_tokens: Token budget for the result, MEMORY_TOKEN_BUDGET by default
+
+    Returns:
+        The recalled turns formatted for the system prompt
+    """
+    if not user_id:
+        return NO_MEMORIES
+
+    k = k or MEMORY_TOP_K
+    max_tokens = max_tokens or MEMORY_TOKEN_BUDGET
+
+    clauses = [{"record_type": "message"}, {"user_id": user_id}]
+    if exclude_session_id:
+        clauses.append({"session_id": {"$ne": exclude_session_id}})
+
+    try:
+        results = conversation_store.similarity_search_with_relevance_scores(
+            query, k=k, filter={"$and": clauses}
+        )
+    except Exception as e:
+        logger.warning(f"Memory recall failed: {e}")
+        return NO_MEMORIES
+
+    lines = []
+    used_tokens = 0
+    for doc, score in results:
+        if score < MEMORY_MIN_RELEVANCE:
+            continue
+
+        text = doc.page_content.strip()
+        if len(text) > MEMORY_SNIPPET_CHARS:
+            text = text[:MEMORY_SNIPPET_CHARS] + "..."
+        speaker = "User" if doc.metadata.get("role") in ("human", "user") else "Assistant"
+        line = f"- ({doc.metadata.get('timestamp', '')[:10]}) {speaker}: {text}"
+
+        tokens = count_tokens(line)
+        if used_tokens + tokens > max_tokens:
+            continue
+        lines.append(line)
+        used_tokens += tokens
+
+    logger.info(f"🧠 Recalled {len(lines)} past turns ({used_tokens} tokens) from {len(results)} candidates")
+    return "\n".join(lines) if lines else NO_MEMORIES
@@ -1,22 +1,97 @@
+import os
+from functools import lru_cache
 from langchain.schema import SystemMessage, AIMessage, HumanMessage
 from utils.logger import logger
 
-def process_message_for_agent(messages):
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _encoding = None
+
+# Token budget for the conversation history sent to the agent
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+
+# Approximate per-message overhead of the chat format (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Count the tokens of a text.
+
+    Results are cached by text, so a message is only tokenized once however
+    many turns it stays in the history. Without tiktoken, ~4 characters per
+    token is used as an estimate.
+
+    Args:
+        text: The text to count
+
+    Returns:
+        The number of tokens
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def _message_tokens(message):
+    """Token count of a message, including the chat-format overhead."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + MESSAGE_TOKEN_OVERHEAD
+
+def select_history_window(messages, max_tokens=None):
+    """Select the largest recent suffix of the conversation that fits a token budget.
+
+    System messages are left out. The most recent message is always kept, even
+    if it alone exceeds the budget.
+
+    Args:
+        messages: A list of message objects
+        max_tokens: The token budget, HISTORY_TOKEN_BUDGET by default
+
+    Returns:
+        A (window, stats) tuple: the selected messages and a dict with the
+        kept/dropped message counts, kept tokens and tokens saved
+    """
+    if max_tokens is None:
+        max_tokens = HISTORY_TOKEN_BUDGET
+
+    history = [m for m in messages if not isinstance(m, SystemMessage)]
+
+    start = len(history)
+    kept_tokens = 0
+    while start > 0:
+        tokens = _message_tokens(history[start - 1])
+        if kept_tokens + tokens > max_tokens and start < len(history):
+            break
+        kept_tokens += tokens
+        start -= 1
+
+    stats = {
+        "kept_messages": len(history) - start,
+        "kept_tokens": kept_tokens,
+        "dropped_messages": start,
+        "saved_tokens": sum(_message_tokens(m) for m in history[:start]),
+    }
+    return history[start:], stats
+
+def process_message_for_agent(messages, max_tokens=None):
     """Process messages to be used by the agent.
 
     Args:
         messages: A list of message objects
+        max_tokens: Token budget for the history, HISTORY_TOKEN_BUDGET by default
 
     Returns:
         A list of messages in the format expected by the agent
     """
     logger.info("Processing messages for agent")
 
-    # Filter out system messages for the agent input
-    filtered_messages = [
-        m for m in messages
-        if not isinstance(m, SystemMessage)
-    ][-5:]  # Only use the last 5 messages for context
+    # Keep the most recent messages that fit in the token budget
+    filtered_messages, stats = select_history_window(messages, max_tokens)
+    logger.info(
+        f"History window: {stats['kept_messages']} messages ({stats['kept_tokens']} tokens), "
+        f"dropped {stats['dropped_messages']} older messages ({stats['saved_tokens']} tokens saved)"
+    )
 
     # Convert LangChain message objects to dict format expected by the agent
     agent_messages = []
@@ -0,0 +1,425 @@
+import os
+import json
+import uuid
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: the single-writer rule is not enforced
+    fcntl = None
+from langchain_core.documents import Document
+
+from utils.logger import logger
+from utils.store_base import DocumentStore, relevance_from_cosine
+
+EMBEDDINGS_FILE = "embeddings.f32"
+RECORDS_FILE = "records.jsonl"
+LOCK_FILE = "LOCK"
+
+# Rows reserved in the embeddings file at a time; the file doubles when it fills up
+INITIAL_CAPACITY = 1024
+
+def normalize_rows(vectors):
+    """Scale vectors to unit length so a dot product is their cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def top_k_rows(matrix, query_vector, k, candidates=None):
+    """Indices and cosine scores of the k rows of a normalized matrix closest to the query.
+
+    All rows are scored with a single matrix-vector product; candidates is an
+    optional boolean mask of the rows that may be returned.
+    """
+    scores = matrix @ query_vector
+    if candidates is not None:
+        scores = np.where(candidates, scores, -np.inf)
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return [], []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top.tolist(), scores[top].tolist()
+
+def _resized(array, size, fill):
+    """Copy of array grown to size, the new slots set to fill."""
+    grown = np.full(size, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _is_number(value):
+    return isinstance(value, (int, float))
+
+class _MetadataIndex:
+    """Per-field index of the rows' metadata, turning `where` filters into NumPy masks.
+
+    Each field keeps the rows holding each of its values (for $eq, $ne, $in,
+    $nin and range comparisons on strings), a mask of the rows that have it
+    and a float64 column of its numeric values (for range comparisons on
+    numbers). A filter costs work per matching row or distinct value, not a
+    Python call per row of the store.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.alive = np.zeros(0, dtype=bool)
+        self._postings = {}
+        self._present = {}
+        self._numbers = {}
+
+    def _grow(self, size):
+        if size <= self.size:
+            return
+        size = max(size, 2 * self.size, INITIAL_CAPACITY)
+        self.alive = _resized(self.alive, size, False)
+        for key in self._present:
+            self._present[key] = _resized(self._present[key], size, False)
+            self._numbers[key] = _resized(self._numbers[key], size, np.nan)
+        self.size = size
+
+    def add(self, row, metadata):
+        self._grow(row + 1)
+        self.alive[row] = True
+        for key, value in metadata.items():
+            if key not in self._present:
+                self._present[key] = np.zeros(self.size, dtype=bool)
+                self._numbers[key] = np.full(self.size, np.nan)
+                self._postings[key] = {}
+            self._present[key][row] = True
+            if _is_number(value):
+                self._numbers[key][row] = value
+            try:
+                self._postings[key].setdefault(value, set()).add(row)
+            except TypeError:
+                # Unhashable values can only be matched by presence
+                pass
+
+    def remove(self, row, metadata):
+        self.alive[row] = False
+        for key, value in metadata.items():
+            self._present[key][row] = False
+            self._numbers[key][row] = np.nan
+            try:
+                rows = self._postings[key].get(value)
+            except TypeError:
+                continue
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._postings[key][value]
+
+    def _rows_mask(self, rows):
+        mask = np.zeros(self.size, dtype=bool)
+        if rows:
+            mask[list(rows)] = True
+        return mask
+
+    def _equal(self, key, operand):
+        try:
+            return self._rows_mask(self._postings[key].get(operand, ()))
+        except TypeError:
+            return np.zeros(self.size, dtype=bool)
+
+    def _field_mask(self, key, operator, operand):
+        if key not in self._present:
+            return np.zeros(self.size, dtype=bool)
+        present = self._present[key]
+        if operator == "$eq":
+            return self._equal(key, operand)
+        if operator == "$ne":
+            return present & ~self._equal(key, operand)
+        if operator in ("$in", "$nin"):
+            mask = np.zeros(self.size, dtype=bool)
+            for value in operand:
+                mask |= self._equal(key, value)
+            return mask if operator == "$in" else present & ~mask
+        if operator not in _RANGE_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+
+        compare = _RANGE_OPERATORS[operator]
+        if _is_number(operand):
+            with np.errstate(invalid="ignore"):
+                return compare(self._numbers[key], operand)
+        # Other operands (e.g. ISO timestamps) are compared once per distinct value
+        mask = np.zeros(self.size, dtype=bool)
+        for value, rows in self._postings[key].items():
+            try:
+                if compare(value, operand):
+                    mask[list(rows)] = True
+            except TypeError:
+                continue
+        return mask
+
+    def mask(self, where):
+        """Boolean mask of the live rows matching a Chroma `where` filter."""
+        mask = self.alive.copy()
+        for key, condition in (where or {}).items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self.mask(clause)
+            elif key == "$or":
+                matched = np.zeros(self.size, dtype=bool)
+                for clause in condition:
+                    matched |= self.mask(clause)
+                mask &= matched
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for operator, operand in condition.items():
+                    mask &= self._field_mask(key, operator, operand)
+        return mask
+
+_RANGE_OPERATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+def _lock_directory(directory):
+    """Hold an exclusive lock on a store directory for the life of the process."""
+    if fcntl is None:
+        return None
+    lock_file = open(os.path.join(directory, LOCK_FILE), "a")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise RuntimeError(f"{directory} is already open; a NumPy store has a single writer, share it with initialize_numpy_store")
+    return lock_file
+
+class NumpyVectorStore(DocumentStore):
+    """In-process vector store backed by a contiguous float32 matrix.
+
+    Embeddings are rows of a memory-mapped file (embeddings.f32) and the ids,
+    documents and metadata are replayed from an append-only log
+    (records.jsonl) when the store opens; the log is rewritten without its
+    superseded entries at that point. A similarity query scores every row
+    with one matrix-vector product; metadata filters are turned into a row
+    mask by a per-field index. Rows of deleted records are reused. Meant for
+    small-to-medium collections that fit in memory, where Chroma's per-query
+    overhead dominates. Only one process may open a directory: use
+    initialize_numpy_store to share the instance within the process.
+    """
+
+    def __init__(self, embedding_function, directory):
+        self.embedding_function = embedding_function
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = _lock_directory(directory)
+        self._lock = threading.RLock()
+        self._embeddings_path = os.path.join(directory, EMBEDDINGS_FILE)
+        self._records_path = os.path.join(directory, RECORDS_FILE)
+
+        # Row-aligned record data; deleted rows keep their slot until it is reused
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._index = _MetadataIndex()
+        self._free_rows = []
+        self._rows = {}
+        self._dim = None
+        self._matrix = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._records_path):
+            return
+        lines = 0
+        with open(self._records_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write
+                    logger.warning(f"Skipping unreadable record in {self._records_path}")
+                    continue
+                if entry.get("deleted"):
+                    row = self._rows.pop(entry["id"], None)
+                    if row is not None:
+                        self._index.remove(row, self._metadatas[row])
+                    continue
+
+                self._dim = entry["dim"]
+                row = entry["row"]
+                while len(self._ids) <= row:
+                    self._ids.append(None)
+                    self._documents.append(None)
+                    self._metadatas.append(None)
+                old_row = self._rows.get(entry["id"])
+                if old_row is not None and old_row != row:
+                    self._index.remove(old_row, self._metadatas[old_row])
+                if self._index.size > row and self._index.alive[row]:
+                    # The row was reused by a later record
+                    self._rows.pop(self._ids[row], None)
+                    self._index.remove(row, self._metadatas[row])
+                self._ids[row] = entry["id"]
+                self._documents[row] = entry["document"]
+                self._metadatas[row] = entry["metadata"]
+                self._index.add(row, entry["metadata"])
+                self._rows[entry["id"]] = row
+
+        self._free_rows = [
+            row for row in range(len(self._ids) - 1, -1, -1)
+            if row >= self._index.size or not self._index.alive[row]
+        ]
+        if lines > len(self._rows):
+            self._compact_log(lines)
+        if self._dim is not None:
+            self._open_matrix(max(INITIAL_CAPACITY, len(self._ids)))
+        logger.info(f"📂 Loaded {len(self._rows)} records from {self.directory}")
+
+    def _compact_log(self, lines):
+        """Rewrite the log with one entry per live record, replacing it atomically."""
+        tmp_path = self._records_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_id, row in sorted(self._rows.items(), key=lambda item: item[1]):
+                f.write(json.dumps({
+                    "id": doc_id,
+                    "row": row,
+                    "dim": self._dim,
+                    "document": self._documents[row],
+                    "metadata": self._metadatas[row],
+                }, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._records_path)
+        logger.info(f"🧹 Compacted {self._records_path} from {lines} to {len(self._rows)} entries")
+
+    def _open_matrix(self, capacity):
+        """Map the embeddings file, growing it to at least capacity rows."""
+        size = capacity * self._dim * 4
+        if not os.path.exists(self._embeddings_path) or os.path.getsize(self._embeddings_path) < size:
+            with open(self._embeddings_path, "ab") as f:
+                f.truncate(size)
+        rows = os.path.getsize(self._embeddings_path) // (self._dim * 4)
+        self._matrix = np.memmap(self._embeddings_path, dtype=np.float32, mode="r+", shape=(rows, self._dim))
+
+    def _append_log(self, entries):
+        with open(self._records_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add_documents(self, documents, ids=None):
+        if not documents:
+            return []
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in documents]
+        vectors = normalize_rows(self.embedding_function.embed_documents([d.page_content for d in documents]))
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                self._open_matrix(INITIAL_CAPACITY)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's {self._dim}")
+
+            entries = []
+            for doc_id, doc, vector in zip(ids, documents, vectors):
+                # Upserts overwrite the existing row in place; new records reuse deleted rows first
+                row = self._rows.get(doc_id)
+                if row is not None:
+                    self._index.remove(row, self._metadatas[row])
+                elif self._free_rows:
+                    row = self._free_rows.pop()
+                else:
+                    row = len(self._ids)
+                    if row >= self._matrix.shape[0]:
+                        self._matrix.flush()
+                        self._open_matrix(self._matrix.shape[0] * 2)
+                    self._ids.append(doc_id)
+                    self._documents.append(None)
+                    self._metadatas.append(None)
+                self._matrix[row] = vector
+                self._ids[row] = doc_id
+                self._documents[row] = doc.page_content
+                self._metadatas[row] = doc.metadata or {}
+                self._index.add(row, self._metadatas[row])
+                self._rows[doc_id] = row
+                entries.append({
+                    "id": doc_id,
+                    "row": row,
+                    "dim": self._dim,
+                    "document": doc.page_content,
+                    "metadata": doc.metadata or {},
+                })
+
+            # Embeddings reach the file before the log entries that point at them
+            self._matrix.flush()
+            self._append_log(entries)
+        return ids
+
+    def _matching_rows(self, ids=None, where=None):
+        if ids is None:
+            return np.flatnonzero(self._index.mask(where)).tolist()
+        rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        if where:
+            mask = self._index.mask(where)
+            rows = [row for row in rows if mask[row]]
+        return rows
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = include if include is not None else ["documents", "metadatas"]
+        with self._lock:
+            rows = self._matching_rows(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            results = {"ids": [self._ids[row] for row in rows]}
+            if "documents" in include:
+                results["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                results["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                results["embeddings"] = [np.array(self._matrix[row]).tolist() for row in rows]
+        return results
+
+    def delete(self, ids=None, where=None):
+        if ids is None and where is None:
+            return
+        with self._lock:
+            rows = self._matching_rows(ids, where)
+            for row in rows:
+                self._index.remove(row, self._metadatas[row])
+                del self._rows[self._ids[row]]
+                self._free_rows.append(row)
+            self._append_log([{"id": self._ids[row], "deleted": True} for row in rows])
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        query_vector = normalize_rows(self.embedding_function.embed_query(query))
+        with self._lock:
+            count = len(self._ids)
+            if not count:
+                return []
+            candidates = self._index.mask(filter)[:count]
+            rows, scores = top_k_rows(self._matrix[:count], query_vector, k, candidates)
+            return [
+                (
+                    Document(page_content=self._documents[row], metadata=self._metadatas[row]),
+                    relevance_from_cosine(score)
+                )
+                for row, score in zip(rows, scores)
+            ]
+
+    def count(self):
+        """Number of records in the store."""
+        with self._lock:
+            return len(self._rows)
+
+_numpy_stores = {}
+_numpy_stores_lock = threading.Lock()
+
+def initialize_numpy_store(embedding_model, persist_directory, collection_name):
+    """Return the NumPy vector store for a collection in persist_directory, one per process."""
+    directory = os.path.join(persist_directory, f"{collection_name}.numpy")
+    with _numpy_stores_lock:
+        if directory not in _numpy_stores:
+            _numpy_stores[directory] = NumpyVectorStore(embedding_model, directory)
+            logger.info(f"🗃️ Initialized NumPy store: {collection_name}")
+        return _numpy_stores[directory]
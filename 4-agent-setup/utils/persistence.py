@@ -0,0 +1,162 @@
+import os
+import atexit
+import threading
+from collections import OrderedDict, deque
+
+from utils.logger import logger
+from utils.conversation import save_conversation
+
+# Outcomes kept for sessions that never read theirs (e.g. the browser was closed)
+MAX_UNREAD_RESULTS = int(os.getenv("WRITE_BEHIND_MAX_UNREAD_RESULTS", "1000"))
+
+class ConversationWriteBehind:
+    """Background queue that persists conversation saves off the UI thread.
+
+    submit() returns immediately. Saves of the same session that are still
+    waiting in the queue are coalesced into one, keeping the latest messages.
+    A single worker thread runs save_conversation for each queued session, in
+    submission order. Pending saves are flushed when the process exits.
+    The outcome of the latest save of each session is kept until result()
+    reads it; only the most recent MAX_UNREAD_RESULTS unread ones are kept.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._order = deque()
+        self._in_flight = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {"submitted": 0, "coalesced": 0, "persisted": 0, "failed": 0}
+        self._tickets = 0
+        self._results = OrderedDict()
+        self._worker = threading.Thread(target=self._run, name="conversation-write-behind", daemon=True)
+        self._worker.start()
+
+    def submit(self, conversation_store, llm, messages, session_id, catalog=None, user_id=None):
+        """Queue a save of the conversation and return without waiting for it.
+
+        Args:
+            conversation_store: The vector store for conversations
+            llm: The language model used for the context summary
+            messages: The conversation messages (copied at submission)
+            session_id: The session to save
+            catalog: Optional conversation catalog to update
+            user_id: Optional user the messages belong to
+
+        Returns:
+            A ticket to pass to result() to learn how the save went
+        """
+        job = {
+            "conversation_store": conversation_store,
+            "llm": llm,
+            "messages": list(messages),
+            "catalog": catalog,
+            "user_id": user_id,
+        }
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is shut down")
+            self._stats["submitted"] += 1
+            self._tickets += 1
+            job["ticket"] = ticket = self._tickets
+            if session_id in self._pending:
+                self._stats["coalesced"] += 1
+            else:
+                self._order.append(session_id)
+            self._pending[session_id] = job
+            self._cond.notify_all()
+        logger.info(f"📥 Queued save for {session_id[:8]}... (queue depth: {self.depth()})")
+        return ticket
+
+    def result(self, session_id, ticket):
+        """Outcome of a submitted save.
+
+        Returns:
+            None while the save is pending, else a dict with "outcome"
+            ("persisted" or "failed") and "error" (the failure message or None).
+            The outcome is returned once and then forgotten.
+        """
+        with self._cond:
+            result = self._results.get(session_id)
+            if result is None or result["ticket"] < ticket:
+                return None
+            del self._results[session_id]
+            return {"outcome": result["outcome"], "error": result["error"]}
+
+    def depth(self):
+        """Number of sessions waiting to be saved, including the one being saved."""
+        with self._cond:
+            return len(self._order) + (1 if self._in_flight else 0)
+
+    def stats(self):
+        """Return queue metrics: current depth and submitted/coalesced/persisted/failed counts."""
+        with self._cond:
+            return {
+                "depth": len(self._order) + (1 if self._in_flight else 0),
+                "in_flight": self._in_flight,
+                **self._stats,
+            }
+
+    def flush(self, timeout=None):
+        """Wait until every queued save has been persisted.
+
+        Returns:
+            True if the queue drained, False on timeout
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._order and not self._in_flight, timeout)
+
+    def shutdown(self, timeout=30):
+        """Flush pending saves and stop the worker."""
+        drained = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        if not drained:
+            logger.warning(f"Write-behind shut down with {self.depth()} unsaved conversations")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._order or self._closed)
+                if not self._order:
+                    return
+                session_id = self._order.popleft()
+                job = self._pending.pop(session_id)
+                self._in_flight = session_id
+
+            try:
+                save_conversation(
+                    job["conversation_store"],
+                    job["llm"],
+                    job["messages"],
+                    session_id,
+                    job["catalog"],
+                    job["user_id"]
+                )
+                outcome, error = "persisted", None
+            except Exception as e:
+                logger.error(f"Background save of {session_id[:8]}... failed: {e}")
+                outcome, error = "failed", str(e)
+
+            with self._cond:
+                self._stats[outcome] += 1
+                self._results.pop(session_id, None)
+                self._results[session_id] = {"ticket": job["ticket"], "outcome": outcome, "error": error}
+                while len(self._results) > MAX_UNREAD_RESULTS:
+                    self._results.popitem(last=False)
+                self._in_flight = None
+                self._cond.notify_all()
+
+_write_behind = None
+_write_behind_lock = threading.Lock()
+
+def get_write_behind():
+    """Return the process-wide write-behind queue, starting it on first use."""
+    global _write_behind
+    with _write_behind_lock:
+        if _write_behind is None:
+            _write_behind = ConversationWriteBehind()
+            atexit.register(_write_behind.shutdown)
+        return _write_behind
@@ -0,0 +1,104 @@
+import threading
+import weakref
+
+from utils.logger import logger
+
+class ResourceRegistry:
+    """Process-wide registry of shared, reference-counted resources.
+
+    Heavy components (LLM client, embedding model, vector stores) are created
+    once per key and shared by every session that acquires them. Each
+    acquire() must be matched by a release(); when the last holder releases
+    a resource it is closed (if it has a close() method) and dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resources = {}
+        self._refcounts = {}
+        self._creating = {}
+
+    def acquire(self, key, factory):
+        """Return the resource for key, creating it with factory() on first use."""
+        while True:
+            with self._lock:
+                if key in self._resources:
+                    self._refcounts[key] += 1
+                    return self._resources[key]
+                pending = self._creating.get(key)
+                if pending is None:
+                    # This thread creates it; others asking for the same key wait
+                    pending = self._creating[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            resource = factory()
+        except Exception:
+            with self._lock:
+                del self._creating[key]
+            pending.set()
+            raise
+
+        with self._lock:
+            self._resources[key] = resource
+            self._refcounts[key] = 1
+            del self._creating[key]
+        pending.set()
+        logger.info(f"🔗 Created shared resource {key}")
+        return resource
+
+    def release(self, key):
+        """Drop one reference to a resource; the last release closes it."""
+        with self._lock:
+            if key not in self._refcounts:
+                return
+            self._refcounts[key] -= 1
+            if self._refcounts[key] > 0:
+                return
+            del self._refcounts[key]
+            resource = self._resources.pop(key)
+
+        close = getattr(resource, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Error closing shared resource {key}: {e}")
+        logger.info(f"🔌 Released shared resource {key}")
+
+    def stats(self):
+        """Reference count of every live resource, by key."""
+        with self._lock:
+            return dict(self._refcounts)
+
+class ResourceLease:
+    """The resources held by one session.
+
+    Resources are released when release() is called or, failing that, when
+    the lease is garbage collected together with the session state.
+    """
+
+    def __init__(self, registry):
+        self._registry = registry
+        self._keys = []
+        self._finalizer = weakref.finalize(self, _release_keys, registry, self._keys)
+
+    def acquire(self, key, factory):
+        resource = self._registry.acquire(key, factory)
+        self._keys.append(key)
+        return resource
+
+    def release(self):
+        self._finalizer()
+
+def _release_keys(registry, keys):
+    for key in keys:
+        registry.release(key)
+    keys.clear()
+
+_registry = ResourceRegistry()
+
+def get_resource_registry():
+    """Return the process-wide resource registry."""
+    return _registry
@@ -0,0 +1,53 @@
+import json
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+# Version of the message encoding, stored next to every encoded payload
+ENCODING_VERSION = 1
+
+def encode_message(message):
+    """Encode a message as compact, versioned JSON.
+
+    The payload keeps everything LangChain serializes for the message (content,
+    tool calls, additional kwargs, ids), so decode_message returns an equal message.
+
+    Args:
+        message: A LangChain message object
+
+    Returns:
+        The encoded payload string
+    """
+    return json.dumps(
+        {"v": ENCODING_VERSION, "m": message_to_dict(message)},
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+
+def decode_message(payload):
+    """Decode a payload produced by encode_message.
+
+    Args:
+        payload: The encoded payload string
+
+    Returns:
+        A LangChain message object
+    """
+    return decode_messages([payload])[0]
+
+def decode_messages(payloads):
+    """Decode many payloads with a single JSON parse.
+
+    Args:
+        payloads: A list of payload strings produced by encode_message
+
+    Returns:
+        A list of LangChain message objects, in the same order
+    """
+    if not payloads:
+        return []
+
+    # Payloads are JSON objects, so joining them gives one JSON array to parse
+    envelopes = json.loads("[" + ",".join(payloads) + "]")
+    for envelope in envelopes:
+        if envelope.get("v") != ENCODING_VERSION:
+            raise ValueError(f"Unsupported message encoding version: {envelope.get('v')}")
+    return messages_from_dict([envelope["m"] for envelope in envelopes])
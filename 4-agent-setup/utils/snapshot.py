@@ -0,0 +1,253 @@
+"""
+Versioned, memory-mapped snapshots of a vector store.
+
+A snapshot directory holds one folder per published version and a CURRENT
+file naming the version in use:
+
+    knowledge.snapshots/
+        CURRENT            -> "v000003"
+        v000003/
+            embeddings.npy  normalized float32 matrix, one row per record
+            records.json    format, version, dim, ids, documents, metadatas
+
+Readers map embeddings.npy read-only, so every process shares the same
+pages through the OS page cache and opening a snapshot costs milliseconds.
+Publishing writes a new version folder and then replaces CURRENT
+atomically; readers pick up the new version on their next query.
+"""
+
+import os
+import json
+import shutil
+import argparse
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.logger import logger
+from utils.store_base import DocumentStore, matches_where, relevance_from_cosine
+from utils.numpy_store import normalize_rows, top_k_rows
+
+SNAPSHOT_FORMAT = 1
+CURRENT_FILE = "CURRENT"
+EMBEDDINGS_FILE = "embeddings.npy"
+RECORDS_FILE = "records.json"
+
+# Published versions kept on disk, so readers still on an older version can finish
+KEEP_VERSIONS = 2
+
+PAGE_SIZE = 1000
+
+def snapshot_directory(persist_directory, collection_name):
+    """Directory holding the snapshots of a collection."""
+    return os.path.join(persist_directory, f"{collection_name}.snapshots")
+
+def current_version(directory):
+    """Name of the published version, or None if nothing was published yet."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+def publish_snapshot(source_store, directory):
+    """Write the records of a vector store as a new snapshot version and make it current.
+
+    Args:
+        source_store: Any store with the DocumentStore get() API (Chroma included)
+        directory: The snapshot directory
+
+    Returns:
+        The name of the published version
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    ids, documents, metadatas, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        page = source_store.get(include=["documents", "metadatas", "embeddings"], limit=PAGE_SIZE, offset=offset)
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(metadata or {} for metadata in page["metadatas"])
+        embeddings.extend(page["embeddings"])
+        if len(page["ids"]) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    matrix = normalize_rows(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+
+    versions = sorted(name for name in os.listdir(directory) if name.startswith("v") and name[1:].isdigit())
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:06d}"
+    staging = os.path.join(directory, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    np.save(os.path.join(staging, EMBEDDINGS_FILE), np.ascontiguousarray(matrix, dtype=np.float32))
+    with open(os.path.join(staging, RECORDS_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "dim": int(matrix.shape[1]) if matrix.size else 0,
+            "ids": ids,
+            "documents": documents,
+            "metadatas": metadatas,
+        }, f, ensure_ascii=False, separators=(",", ":"))
+    _fsync_file(os.path.join(staging, EMBEDDINGS_FILE))
+    _fsync_file(os.path.join(staging, RECORDS_FILE))
+    os.rename(staging, os.path.join(directory, version))
+
+    # Swap the pointer atomically
+    pointer_tmp = os.path.join(directory, f".{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(directory, CURRENT_FILE))
+    logger.info(f"📸 Published snapshot {version} with {len(ids)} records to {directory}")
+
+    # Remove old versions; processes that still map them keep their pages until they reopen
+    for old in versions[:max(0, len(versions) + 1 - KEEP_VERSIONS)]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+class ReadOnlyStoreError(PermissionError):
+    """Raised on writes to a snapshot store, which is read-only by design."""
+
+class _LoadedSnapshot:
+    """One opened snapshot version; replaced as a whole when a new version is published."""
+
+    def __init__(self, directory, version):
+        self.version = version
+        self.matrix = None
+        self.ids, self.documents, self.metadatas = [], [], []
+        if version is None:
+            self.rows = {}
+            return
+
+        path = os.path.join(directory, version)
+        with open(os.path.join(path, RECORDS_FILE), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        if records.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format: {records.get('format')}")
+
+        self.matrix = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        self.ids = records["ids"]
+        self.documents = records["documents"]
+        self.metadatas = records["metadatas"]
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        logger.info(f"📸 Opened snapshot {version} ({len(self.ids)} records)")
+
+class SnapshotStore(DocumentStore):
+    """Read-only vector store serving the current snapshot of a directory.
+
+    The embeddings are memory-mapped, not read, so opening is fast and the
+    matrix is shared with every other process serving the same snapshot.
+    Each query checks CURRENT and switches to a newly published version.
+    """
+
+    def __init__(self, embedding_function, directory):
+        self.embedding_function = embedding_function
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pointer_mtime = None
+        self._snapshot = _LoadedSnapshot(directory, current_version(directory))
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def _current(self):
+        """Return the snapshot to serve, switching to a new version if CURRENT changed."""
+        try:
+            mtime = os.stat(os.path.join(self.directory, CURRENT_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return self._snapshot
+        with self._lock:
+            if mtime != self._pointer_mtime:
+                self._pointer_mtime = mtime
+                version = current_version(self.directory)
+                if version != self._snapshot.version:
+                    self._snapshot = _LoadedSnapshot(self.directory, version)
+            return self._snapshot
+
+    def add_documents(self, documents, ids=None):
+        raise ReadOnlyStoreError("Snapshots are read-only; write to the source store and publish a new snapshot")
+
+    def delete(self, ids=None, where=None):
+        raise ReadOnlyStoreError("Snapshots are read-only; write to the source store and publish a new snapshot")
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        snapshot = self._current()
+        include = include if include is not None else ["documents", "metadatas"]
+        if ids is not None:
+            rows = [snapshot.rows[doc_id] for doc_id in ids if doc_id in snapshot.rows]
+        else:
+            rows = range(len(snapshot.ids))
+        rows = [row for row in rows if matches_where(snapshot.metadatas[row], where)]
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+
+        results = {"ids": [snapshot.ids[row] for row in rows]}
+        if "documents" in include:
+            results["documents"] = [snapshot.documents[row] for row in rows]
+        if "metadatas" in include:
+            results["metadatas"] = [snapshot.metadatas[row] for row in rows]
+        if "embeddings" in include:
+            results["embeddings"] = [np.array(snapshot.matrix[row]).tolist() for row in rows]
+        return results
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        snapshot = self._current()
+        if not snapshot.ids:
+            return []
+        query_vector = normalize_rows(self.embedding_function.embed_query(query))
+        candidates = None
+        if filter:
+            candidates = np.fromiter(
+                (matches_where(metadata, filter) for metadata in snapshot.metadatas), dtype=bool, count=len(snapshot.ids)
+            )
+        rows, scores = top_k_rows(snapshot.matrix, query_vector, k, candidates)
+        return [
+            (Document(page_content=snapshot.documents[row], metadata=snapshot.metadatas[row]), relevance_from_cosine(score))
+            for row, score in zip(rows, scores)
+        ]
+
+    def count(self):
+        """Number of records in the current snapshot."""
+        return len(self._current().ids)
+
+_snapshot_stores = {}
+_snapshot_stores_lock = threading.Lock()
+
+def initialize_snapshot_store(embedding_model, persist_directory, collection_name):
+    """Return the snapshot store of a collection, shared by all sessions of the process."""
+    directory = snapshot_directory(persist_directory, collection_name)
+    with _snapshot_stores_lock:
+        if directory not in _snapshot_stores:
+            if current_version(directory) is None:
+                logger.warning(f"No snapshot published in {directory} yet; the store is empty")
+            _snapshot_stores[directory] = SnapshotStore(embedding_model, directory)
+        return _snapshot_stores[directory]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish a snapshot of a vector store collection.")
+    parser.add_argument("--persist-directory", default="knowledge_store")
+    parser.add_argument("--collection", default="knowledge")
+    parser.add_argument("--source-backend", default="chroma", help="Backend holding the records to snapshot")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from utils.vector import initialize_vector_store, initialize_embedding_model
+
+    load_dotenv()
+    args = parse_args()
+    source = initialize_vector_store(
+        initialize_embedding_model(), args.persist_directory, args.collection, args.source_backend
+    )
+    publish_snapshot(source, snapshot_directory(args.persist_directory, args.collection))
@@ -0,0 +1,242 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.logger import logger
+from utils.store_base import DocumentStore, relevance_from_cosine
+
+# Metadata keys stored in their own indexed columns; other keys are read from the JSON metadata
+INDEXED_COLUMNS = ("session_id", "user_id", "record_type", "seq", "timestamp")
+
+_SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+def _column(key):
+    if key in INDEXED_COLUMNS:
+        return key
+    if '"' in key:
+        raise ValueError(f"Unsupported metadata key: {key}")
+    return f"json_extract(metadata, '$.\"{key}\"')"
+
+def _where_sql(where):
+    """Translate a Chroma `where` filter into an SQL condition and its parameters."""
+    if not where:
+        return "1", []
+
+    conditions = []
+    params = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(clause) for clause in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            conditions.append("(" + joiner.join(sql for sql, _ in parts) + ")" if parts else "1")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+
+        column = _column(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator in _SQL_OPERATORS:
+                conditions.append(f"{column} {_SQL_OPERATORS[operator]} ?")
+                params.append(operand)
+            elif operator in ("$in", "$nin"):
+                if not operand:
+                    conditions.append("0" if operator == "$in" else f"{column} IS NOT NULL")
+                    continue
+                placeholders = ",".join("?" for _ in operand)
+                negate = "NOT " if operator == "$nin" else ""
+                conditions.append(f"({column} IS NOT NULL AND {column} {negate}IN ({placeholders}))")
+                params.extend(operand)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+
+    return " AND ".join(conditions), params
+
+class SQLiteConversationStore(DocumentStore):
+    """Conversation store kept in one SQLite file in WAL mode.
+
+    Each record is a row with its document, JSON metadata and normalized
+    float32 embedding. session_id, user_id, record_type, seq and timestamp are
+    also stored in indexed columns, so the lookups of the conversation helpers
+    (a session's header or message range, a user's messages) are index reads
+    rather than scans. WAL lets readers run while a session is being written.
+    Embeddings are computed before the write transaction starts, so writers
+    only hold the lock for the inserts, and each thread uses its own connection.
+    """
+
+    def __init__(self, embedding_function, path):
+        self.embedding_function = embedding_function
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._connection()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id TEXT PRIMARY KEY,
+                session_id TEXT,
+                user_id TEXT,
+                record_type TEXT,
+                seq INTEGER,
+                timestamp TEXT,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                embedding BLOB
+            );
+            CREATE INDEX IF NOT EXISTS records_session ON records (session_id, record_type, seq);
+            CREATE INDEX IF NOT EXISTS records_user ON records (user_id, record_type, timestamp);
+            CREATE INDEX IF NOT EXISTS records_timestamp ON records (timestamp);
+            """
+        )
+
+    def _connection(self):
+        """Return this thread's connection, in autocommit mode with explicit write transactions."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statement, rows):
+        conn = self._connection()
+        # Take the write lock up front so concurrent writers wait on the busy timeout
+        # instead of failing when upgrading a read transaction
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(statement, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _embed_documents(self, texts):
+        vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add_documents(self, documents, ids=None):
+        if not documents:
+            return []
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in documents]
+        vectors = self._embed_documents([d.page_content for d in documents])
+
+        rows = []
+        for doc_id, doc, vector in zip(ids, documents, vectors):
+            metadata = doc.metadata or {}
+            rows.append((
+                doc_id,
+                *(metadata.get(column) for column in INDEXED_COLUMNS),
+                doc.page_content,
+                json.dumps(metadata, ensure_ascii=False, separators=(",", ":")),
+                vector.tobytes(),
+            ))
+
+        self._write(
+            """
+            INSERT INTO records (id, session_id, user_id, record_type, seq, timestamp, document, metadata, embedding)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                session_id = excluded.session_id,
+                user_id = excluded.user_id,
+                record_type = excluded.record_type,
+                seq = excluded.seq,
+                timestamp = excluded.timestamp,
+                document = excluded.document,
+                metadata = excluded.metadata,
+                embedding = excluded.embedding
+            """,
+            rows
+        )
+        return ids
+
+    def _select(self, columns, ids=None, where=None, limit=None, offset=None):
+        sql, params = _where_sql(where)
+        if ids is not None:
+            if not ids:
+                return []
+            sql += f" AND id IN ({','.join('?' for _ in ids)})"
+            params = params + list(ids)
+        query = f"SELECT {columns} FROM records WHERE {sql} ORDER BY rowid"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params = params + [limit if limit is not None else -1, offset or 0]
+        return self._connection().execute(query, params).fetchall()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = include if include is not None else ["documents", "metadatas"]
+        rows = self._select("id, document, metadata, embedding", ids, where, limit, offset)
+        results = {"ids": [row[0] for row in rows]}
+        if "documents" in include:
+            results["documents"] = [row[1] for row in rows]
+        if "metadatas" in include:
+            results["metadatas"] = [json.loads(row[2]) for row in rows]
+        if "embeddings" in include:
+            results["embeddings"] = [
+                np.frombuffer(row[3], dtype=np.float32).tolist() if row[3] else None for row in rows
+            ]
+        return results
+
+    def delete(self, ids=None, where=None):
+        if ids is None and where is None:
+            return
+        sql, params = _where_sql(where)
+        if ids is not None:
+            if not ids:
+                return
+            sql += f" AND id IN ({','.join('?' for _ in ids)})"
+            params = params + list(ids)
+        self._write(f"DELETE FROM records WHERE {sql}", [params])
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        query_vector = np.asarray(self.embedding_function.embed_query(query), dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1
+
+        # The filter narrows the candidates first (e.g. to one user's messages)
+        rows = self._select("rowid, embedding", where=filter)
+        rows = [row for row in rows if row[1]]
+        if not rows:
+            return []
+
+        matrix = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        scores = matrix @ query_vector
+        top = np.argsort(-scores)[:k]
+
+        rowids = [rows[i][0] for i in top]
+        found = {
+            row[0]: row
+            for row in self._connection().execute(
+                f"SELECT rowid, document, metadata FROM records WHERE rowid IN ({','.join('?' for _ in rowids)})",
+                rowids
+            )
+        }
+        results = []
+        for i, rowid in zip(top, rowids):
+            if rowid in found:
+                _, document, metadata = found[rowid]
+                results.append((
+                    Document(page_content=document, metadata=json.loads(metadata)),
+                    relevance_from_cosine(float(scores[i]))
+                ))
+        return results
+
+    def count(self):
+        """Number of records in the store."""
+        return self._connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+def initialize_sqlite_store(embedding_model, persist_directory, collection_name):
+    """Open the SQLite conversation store for a collection in persist_directory."""
+    path = os.path.join(persist_directory, f"{collection_name}.sqlite3")
+    store = SQLiteConversationStore(embedding_model, path)
+    logger.info(f"🗃️ Initialized SQLite store: {path}")
+    return store
@@ -0,0 +1,87 @@
+"""
+Interface shared by the vector store backends.
+
+The conversation and knowledge helpers only use a small part of the Chroma
+vector store API. Any backend that implements the methods of DocumentStore,
+with the same arguments and return values, can be returned by
+utils.vector.initialize_vector_store.
+"""
+
+import math
+from abc import ABC, abstractmethod
+
+# Chroma's default (L2) relevance function, applied to the cosine similarity of unit
+# vectors, so scores (and thresholds such as MEMORY_MIN_RELEVANCE) match across backends
+def relevance_from_cosine(cosine):
+    return 1.0 - math.sqrt(max(0.0, 2.0 - 2.0 * cosine)) / math.sqrt(2.0)
+
+class DocumentStore(ABC):
+    """The subset of the Chroma vector store API used by the app.
+
+    Metadata filters use Chroma's `where` syntax: {"key": value},
+    {"key": {"$gte": value}} and {"$and": [...]} / {"$or": [...]}.
+    A backend missing one of the abstract methods cannot be instantiated.
+    """
+
+    @abstractmethod
+    def add_documents(self, documents, ids=None):
+        """Embed and upsert LangChain documents; returns their ids."""
+
+    @abstractmethod
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        """Return {"ids": [...], "documents": [...], "metadatas": [...]} of the matching records.
+
+        include may also ask for "embeddings".
+        """
+
+    @abstractmethod
+    def delete(self, ids=None, where=None):
+        """Delete records by id or by metadata filter."""
+
+    @abstractmethod
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        """Return the k (document, relevance) pairs most similar to query, most relevant first."""
+
+    def similarity_search(self, query, k=4, filter=None):
+        """Return the k documents most similar to query."""
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, filter=filter)]
+
+_COMPARISONS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+def matches_where(metadata, where):
+    """Evaluate a Chroma `where` filter against one record's metadata.
+
+    As in Chroma, a record without the filtered key never matches.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator not in _COMPARISONS:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+                try:
+                    if not _COMPARISONS[operator](metadata[key], operand):
+                        return False
+                except TypeError:
+                    return False
+    return True
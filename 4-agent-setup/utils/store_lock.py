@@ -0,0 +1,72 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: store locks are not enforced
+    fcntl = None
+
+from utils.logger import logger
+
+# Lock file kept in every store directory
+STORE_LOCK_FILE = ".store.lock"
+
+class StoreInUseError(RuntimeError):
+    """Raised when a store directory is locked by another process."""
+
+_held_locks = {}
+_held_locks_lock = threading.Lock()
+
+def _lock_path(directory):
+    return os.path.join(directory, STORE_LOCK_FILE)
+
+def hold_store_lock(directory):
+    """Take a shared lock on a store directory for the life of the process.
+
+    Every process that opens a store (the app, ingest_knowledge.py) holds one,
+    so maintenance commands, which need the lock exclusively, refuse to run
+    while the store is in use, and the app refuses to open a store under
+    maintenance. Taken once per directory per process.
+    """
+    if fcntl is None:
+        return
+    directory = os.path.abspath(directory)
+    with _held_locks_lock:
+        if directory in _held_locks:
+            return
+        os.makedirs(directory, exist_ok=True)
+        lock_file = open(_lock_path(directory), "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise StoreInUseError(f"{directory} is locked by a maintenance command; try again when it is done")
+        _held_locks[directory] = lock_file
+
+@contextmanager
+def exclusive_store_lock(directories, action):
+    """Hold exclusive locks on store directories, failing if any is in use.
+
+    Args:
+        directories: The store directories; missing ones are skipped
+        action: What needs the stores, for the error message (e.g. "take a snapshot")
+    """
+    held = []
+    try:
+        for directory in directories:
+            if fcntl is None or not os.path.isdir(directory):
+                continue
+            lock_file = open(_lock_path(directory), "a")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise StoreInUseError(f"Stop the app before you {action}: {directory} is open in another process")
+            held.append(lock_file)
+        logger.debug(f"Locked {len(held)} store directories to {action}")
+        yield
+    finally:
+        for lock_file in held:
+            lock_file.close()
@@ -0,0 +1,55 @@
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.logger import logger
+
+# Minimum time between two redraws of the streamed answer
+STREAM_REFRESH_SECONDS = 0.05
+
+class ChatStreamHandler(BaseCallbackHandler):
+    """Stream an agent's tokens and tool progress into Streamlit placeholders.
+
+    Pass it in the invoke config ({"callbacks": [handler]}). Tokens of the
+    current LLM call are drawn into answer_placeholder, redrawn at most every
+    STREAM_REFRESH_SECONDS; a new LLM call (after a tool ran) starts a fresh
+    answer. Tool starts and ends are shown in status_placeholder. The time to
+    first token, from creation of the handler, is kept in ttft_ms.
+    """
+
+    def __init__(self, answer_placeholder, status_placeholder):
+        self.answer_placeholder = answer_placeholder
+        self.status_placeholder = status_placeholder
+        self.started = time.perf_counter()
+        self.ttft_ms = None
+        self.text = ""
+        self._last_draw = 0.0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.text = ""
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.text = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not token:
+            return
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.started) * 1000
+            logger.info(f"⚡ First token after {self.ttft_ms:.0f} ms")
+            self.status_placeholder.empty()
+        self.text += token
+
+        now = time.perf_counter()
+        if now - self._last_draw >= STREAM_REFRESH_SECONDS:
+            self.answer_placeholder.markdown(self.text + "▌")
+            self._last_draw = now
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        name = (serialized or {}).get("name", "tool")
+        self.status_placeholder.caption(f"🔧 Running {name}...")
+
+    def on_tool_end(self, output, **kwargs):
+        self.status_placeholder.caption("✅ Tool finished, writing the answer...")
+
+    def on_tool_error(self, error, **kwargs):
+        self.status_placeholder.caption(f"⚠️ A tool failed: {error}")
@@ -1,78 +1,166 @@
 import streamlit as st
+import os
+import time
 import uuid
+import random
+import logging
 from langchain.schema import SystemMessage, AIMessage, HumanMessage
 from utils.logger import logger
-from utils.conversation import save_conversation, get_saved_conversations, load_conversation_messages
-from utils.messaging import process_message_for_agent, create_initial_messages
+from utils.conversation import (
+    NEW_CONVERSATION_CONTEXT,
+    get_conversation_page,
+    rebuild_catalog,
+    load_context_summary,
+    load_conversation_messages,
+)
+from utils.persistence import get_write_behind
+from utils.resources import ResourceLease, get_resource_registry
+from utils.vector import vector_store_key
+from utils.memory import recall_memories
+from utils.streaming import ChatStreamHandler
+from utils.messaging import process_message_for_agent, select_history_window, create_initial_messages
+
+# Take the user id from the ?user= URL parameter. Anyone can edit the URL and recall
+# another user's conversations, so only enable this for local development
+MEMORY_USER_FROM_URL = os.getenv("MEMORY_USER_FROM_URL", "false").lower() == "true"
+
+def _resolve_user_id():
+    """Return the id used for cross-session memory, or None to keep recall to the session.
+
+    Only a user signed in with Streamlit authentication (st.login) is trusted.
+    """
+    user = getattr(st, "user", None)
+    if user is not None and getattr(user, "is_logged_in", False):
+        email = getattr(user, "email", None)
+        if email:
+            return email
+    if MEMORY_USER_FROM_URL:
+        return st.query_params.get("user", "default")
+    return None
 
 def initialize_session_state(initializer):
-    """Initialize Streamlit session state with necessary components."""
+    """Initialize Streamlit session state with necessary components.
+
+    The LLM client, embedding model and stores are shared by all sessions
+    through the process-wide resource registry; the session only keeps
+    references to them, plus its own messages.
+    """
     # Generate a new session ID if not already set
     if "session_id" not in st.session_state:
         st.session_state.session_id = str(uuid.uuid4())
         logger.info(f"🆕 Created new session: {st.session_state.session_id[:8]}...")
 
+    # Identify the user so memories can be recalled across their sessions; checked
+    # on every run, since signing in happens during the session
+    st.session_state.user_id = _resolve_user_id()
+
+    # Shared resources held by this session, released when the session state is dropped
+    if "resource_lease" not in st.session_state:
+        st.session_state.resource_lease = ResourceLease(get_resource_registry())
+    lease = st.session_state.resource_lease
+    provider = initializer.get("embedding_provider")
+
     # Initialize LLM if not already done
     if "llm" not in st.session_state:
-        st.session_state.llm = initializer["llm"]()
+        st.session_state.llm = lease.acquire(("llm",), initializer["llm"])
 
     # Initialize embedding model and stores
     if "embedding_model" not in st.session_state:
-        st.session_state.embedding_model = initializer["embedding_model"]()
-
-    if "conversation_store" not in st.session_state:
-        st.session_state.conversation_store = initializer["conversation_store"]["initialize"](
-            st.session_state.embedding_model,
-            initializer["conversation_store"]["persist_directory"],
-            initializer["conversation_store"]["collection_name"]
+        st.session_state.embedding_model = lease.acquire(
+            ("embedding_model", provider), lambda: initializer["embedding_model"](provider)
         )
 
-    if "knowledge_store" not in st.session_state:
-        st.session_state.knowledge_store = initializer["knowledge_store"]["initialize"](
-            st.session_state.embedding_model,
-            initializer["knowledge_store"]["persist_directory"],
-            initializer["knowledge_store"]["collection_name"]
+    for store_name in ("conversation_store", "knowledge_store"):
+        if store_name not in st.session_state:
+            config = initializer[store_name]
+            backend = config.get("backend", "chroma")
+            st.session_state[store_name] = lease.acquire(
+                vector_store_key(config["persist_directory"], config["collection_name"], backend, provider),
+                lambda: config["initialize"](
+                    st.session_state.embedding_model,
+                    config["persist_directory"],
+                    config["collection_name"],
+                    backend
+                )
+            )
+
+    if "conversation_catalog" not in st.session_state:
+        catalog = initializer["conversation_catalog"]["initialize"](
+            initializer["conversation_catalog"]["path"]
         )
+        # Backfill the catalog from conversations saved before it existed
+        if catalog.count() == 0:
+            rebuild_catalog(catalog, st.session_state.conversation_store)
+        st.session_state.conversation_catalog = catalog
 
     # Initialize messages array if not exists
     if "messages" not in st.session_state:
         st.session_state.messages = create_initial_messages(initializer["system_prompt"], initializer["welcome_message"])
 
-    # Initialize conversation chain last, after all dependencies are set up
+    # Summary of the current conversation, passed to the agent on every turn
+    if "context_summary" not in st.session_state:
+        st.session_state.context_summary = NEW_CONVERSATION_CONTEXT
+
+    # The agent executor is shared by all sessions like the LLM it is built on. Its key
+    # names that LLM instance, so an executor never outlives or pins a replaced LLM
     if "conversation_chain" not in st.session_state:
-        st.session_state.conversation_chain = initializer["agent"](
-            st.session_state.llm,
-            st.session_state.conversation_store,
-            st.session_state.session_id,
-            initializer["system_prompt"]
+        llm = st.session_state.llm
+        st.session_state.conversation_chain = lease.acquire(
+            ("agent", id(llm), initializer["system_prompt"]),
+            lambda: initializer["agent"](llm, initializer["system_prompt"])
         )
 
+# Number of most recent messages drawn; older ones are collapsed until requested
+CHAT_RENDER_WINDOW = int(os.getenv("CHAT_RENDER_WINDOW", "30"))
+
+# Fraction of rendered messages logged at debug level
+RENDER_LOG_SAMPLE_RATE = float(os.getenv("RENDER_LOG_SAMPLE_RATE", "0.05"))
+
+def _render_entry(message):
+    """Return the (role, markdown) entry of a message, or None to skip it."""
+    if isinstance(message, HumanMessage):
+        return "user", message.content
+    if isinstance(message, AIMessage):
+        # Handle both string and dict content
+        return "assistant", str(message.content) if isinstance(message.content, dict) else message.content
+    if not isinstance(message, SystemMessage):
+        logger.warning(f"Unknown message type: {type(message)}")
+    return None
+
 def render_chat():
-    """Render the chat messages in the Streamlit app"""
-    logger.info(f"Rendering {len(st.session_state.messages)} messages")
+    """Render the chat messages in the Streamlit app.
+
+    Only the most recent CHAT_RENDER_WINDOW messages are drawn; earlier ones
+    are collapsed behind a button, so a rerun costs the same however long the
+    conversation gets.
+    """
+    messages = st.session_state.messages
+    if "chat_render_window" not in st.session_state:
+        st.session_state.chat_render_window = CHAT_RENDER_WINDOW
+
+    # System messages are never drawn, so they don't count as hidden
+    start = max(0, len(messages) - st.session_state.chat_render_window)
+    hidden = sum(1 for m in messages[:start] if not isinstance(m, SystemMessage))
+    if hidden and st.button(f"⬆️ Show {min(hidden, CHAT_RENDER_WINDOW)} earlier messages ({hidden} hidden)"):
+        st.session_state.chat_render_window += CHAT_RENDER_WINDOW
+        st.rerun()
 
-    for i, message in enumerate(st.session_state.messages):
+    for i in range(start, len(messages)):
         try:
-            if isinstance(message, HumanMessage):
-                st.chat_message("user").markdown(message.content)
-                logger.info(f"Rendered user message #{i}: {message.content[:30]}...")
-            elif isinstance(message, AIMessage):
-                logger.info(f"Rendering AI message #{i}: {message.content[:50]}...")
-                # Handle both string and dict content
-                if isinstance(message.content, dict):
-                    st.chat_message("assistant").markdown(str(message.content))
-                else:
-                    st.chat_message("assistant").markdown(message.content)
-            elif isinstance(message, SystemMessage):
-                logger.info(f"Skipping system message #{i}")
-                pass
-            else:
-                logger.warning(f"Unknown message type: {type(message)}")
+            entry = _render_entry(messages[i])
+            if entry is None:
+                continue
+            role, markdown = entry
+            st.chat_message(role).markdown(markdown)
+            if logger.isEnabledFor(logging.DEBUG) and random.random() < RENDER_LOG_SAMPLE_RATE:
+                logger.debug(f"Rendered {role} message #{i}: {str(markdown)[:30]}...")
         except Exception as e:
             logger.error(f"Error rendering message #{i}: {e}")
             # Continue rendering other messages even if one fails
             continue
 
+    logger.debug(f"Rendered {len(messages) - start} of {len(messages)} messages")
+
 def handle_user_input(prompt):
     """Process user input and generate a response"""
     logger.info(f"🗣️ User input: {prompt[:30]}...")
@@ -84,49 +172,80 @@ def handle_user_input(prompt):
     # Display the message in the UI
     st.chat_message("user").markdown(message.content)
 
-    # Generate a response using the agent
+    # Generate a response using the agent, streaming it into the assistant bubble
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                logger.info("🤔 Generating response with tools...")
+        status_placeholder = st.empty()
+        answer_placeholder = st.empty()
+        status_placeholder.caption("🤔 Thinking...")
+        stream_handler = ChatStreamHandler(answer_placeholder, status_placeholder)
 
-                # Process messages for the agent
-                agent_messages = process_message_for_agent(st.session_state.messages)
+        try:
+            logger.info("🤔 Generating response with tools...")
 
-                # Invoke the agent
-                try:
-                    response = st.session_state.conversation_chain.invoke(
-                        {"messages": agent_messages}
-                    )
+            # Process messages for the agent
+            agent_messages = process_message_for_agent(st.session_state.messages)
+
+            # Recall relevant turns from the user's other conversations
+            memories = recall_memories(
+                st.session_state.conversation_store,
+                prompt,
+                st.session_state.user_id,
+                exclude_session_id=st.session_state.session_id
+            )
 
-                    logger.info(f"Agent response: {str(response)[:100]}...")
-
-                    if response and "output" in response:
-                        output_content = response["output"]
-                        st.markdown(output_content)
-                        st.session_state.messages.append(AIMessage(content=output_content))
-                        logger.info("✅ Response generated successfully")
-                    else:
-                        error_msg = "Received empty or invalid response from agent"
-                        logger.warning(error_msg)
-                        fallback_response = "I'm sorry, I couldn't generate a proper response with my tools. Please try asking about a specific city for travel recommendations."
-                        st.markdown(fallback_response)
-                        st.session_state.messages.append(AIMessage(content=fallback_response))
-                except Exception as agent_error:
-                    logger.error(f"Agent error: {str(agent_error)}")
-                    # Fallback to regular LLM if agent fails
-                    filtered_messages = [m for m in st.session_state.messages if not isinstance(m, SystemMessage)][-5:]
-                    fallback_response = st.session_state.llm.invoke(filtered_messages).content
-                    st.markdown(fallback_response)
+            # Invoke the agent
+            try:
+                response = st.session_state.conversation_chain.invoke(
+                    {
+                        "messages": agent_messages,
+                        "history": memories,
+                        "context": st.session_state.context_summary,
+                    },
+                    config={"callbacks": [stream_handler]}
+                )
+
+                logger.info(f"Agent response: {str(response)[:100]}...")
+
+                if response and "output" in response:
+                    output_content = response["output"]
+                    answer_placeholder.markdown(output_content)
+                    st.session_state.messages.append(AIMessage(content=output_content))
+                    logger.info("✅ Response generated successfully")
+                else:
+                    error_msg = "Received empty or invalid response from agent"
+                    logger.warning(error_msg)
+                    fallback_response = "I'm sorry, I couldn't generate a proper response with my tools. Please try asking about a specific city for travel recommendations."
+                    answer_placeholder.markdown(fallback_response)
                     st.session_state.messages.append(AIMessage(content=fallback_response))
-                    logger.info("✅ Fallback response generated")
+            except Exception as agent_error:
+                logger.error(f"Agent error: {str(agent_error)}")
+                # Fallback to regular LLM if agent fails
+                filtered_messages, _ = select_history_window(st.session_state.messages)
+                fallback_response = st.session_state.llm.invoke(
+                    filtered_messages, config={"callbacks": [stream_handler]}
+                ).content
+                answer_placeholder.markdown(fallback_response)
+                st.session_state.messages.append(AIMessage(content=fallback_response))
+                logger.info("✅ Fallback response generated")
 
-            except Exception as e:
-                error_msg = f"Error generating response: {str(e)}"
-                logger.error(error_msg)
-                st.markdown(f"⚠️ {error_msg}")
-                st.session_state.messages.append(AIMessage(content=f"I'm sorry, I encountered an error while processing your request. Please try again with a different question."))
-                logger.exception("Exception details:")
+        except Exception as e:
+            error_msg = f"Error generating response: {str(e)}"
+            logger.error(error_msg)
+            answer_placeholder.markdown(f"⚠️ {error_msg}")
+            st.session_state.messages.append(AIMessage(content=f"I'm sorry, I encountered an error while processing your request. Please try again with a different question."))
+            logger.exception("Exception details:")
+        finally:
+            status_placeholder.empty()
+
+    # Keep the latency of each answer for monitoring
+    total_ms = (time.perf_counter() - stream_handler.started) * 1000
+    st.session_state.setdefault("response_metrics", []).append(
+        {"ttft_ms": stream_handler.ttft_ms, "total_ms": total_ms}
+    )
+    logger.info(
+        f"⏱️ Answer took {total_ms:.0f} ms"
+        + (f" (first token after {stream_handler.ttft_ms:.0f} ms)" if stream_handler.ttft_ms is not None else "")
+    )
 
 def setup_sidebar(initializer):
     """Setup the sidebar with conversation controls"""
@@ -137,12 +256,8 @@ def setup_sidebar(initializer):
         logger.info("🆕 Starting new conversation")
         st.session_state.session_id = str(uuid.uuid4())
         st.session_state.messages = create_initial_messages(initializer["system_prompt"], initializer["welcome_message"])
-        st.session_state.conversation_chain = initializer["agent"](
-            st.session_state.llm,
-            st.session_state.conversation_store,
-            st.session_state.session_id,
-            initializer["system_prompt"]
-        )
+        st.session_state.context_summary = NEW_CONVERSATION_CONTEXT
+        st.session_state.chat_render_window = CHAT_RENDER_WINDOW
         st.sidebar.success("New conversation started!")
         st.rerun()
 
@@ -151,20 +266,41 @@ def setup_sidebar(initializer):
         # Only save if we have more than just the system message and welcome message
         if len(st.session_state.messages) > 2:
             logger.info("💾 Saving current conversation")
-            save_conversation(
+            # Persist on the background worker so the UI doesn't wait for the summary and embeddings
+            ticket = get_write_behind().submit(
                 st.session_state.conversation_store,
                 st.session_state.llm,
                 st.session_state.messages,
-                st.session_state.session_id
+                st.session_state.session_id,
+                st.session_state.conversation_catalog,
+                st.session_state.user_id
             )
-            st.sidebar.success("Conversation saved successfully!")
+            st.session_state.pending_save = (st.session_state.session_id, ticket)
         else:
             st.sidebar.warning("Start a conversation before saving")
 
+    # Report the save once the worker has run it
+    if st.session_state.get("pending_save"):
+        result = get_write_behind().result(*st.session_state.pending_save)
+        if result is None:
+            st.sidebar.info("💾 Saving conversation...")
+        else:
+            st.session_state.pending_save = None
+            if result["outcome"] == "persisted":
+                st.sidebar.success("Conversation saved successfully!")
+            else:
+                st.sidebar.error(f"Saving the conversation failed: {result['error']}")
+
+    save_stats = get_write_behind().stats()
+    if save_stats["depth"]:
+        st.sidebar.caption(f"⏳ {save_stats['depth']} conversation(s) being saved in the background")
+
     # Create a clear conversation button
     if st.sidebar.button("🗑️ Clear Conversation"):
         logger.info("🗑️ Clearing current conversation")
         st.session_state.messages = create_initial_messages(initializer["system_prompt"], initializer["welcome_message"])
+        st.session_state.context_summary = NEW_CONVERSATION_CONTEXT
+        st.session_state.chat_render_window = CHAT_RENDER_WINDOW
         st.sidebar.success("Conversation cleared!")
         st.rerun()
 
@@ -172,9 +308,17 @@ def setup_sidebar(initializer):
     st.sidebar.divider()
     st.sidebar.subheader("Saved Conversations")
 
-    saved_conversations = get_saved_conversations(st.session_state.conversation_store)
+    # Cursors of the pages above the current one, for paging back to newer conversations
+    if "conversation_page_cursors" not in st.session_state:
+        st.session_state.conversation_page_cursors = [None]
+
+    saved_conversations, next_cursor = get_conversation_page(
+        st.session_state.conversation_catalog,
+        limit=10,
+        cursor=st.session_state.conversation_page_cursors[-1]
+    )
     if saved_conversations:
-        for i, conv in enumerate(saved_conversations[:10]):  # Show only the 10 most recent
+        for i, conv in enumerate(saved_conversations):
             # Use index to ensure unique keys
             conv_button_label = f"🗣️ {conv['title']} ({conv['message_count']} msgs)"
             unique_key = f"conv_{conv['id']}_{i}"
@@ -190,9 +334,21 @@ def setup_sidebar(initializer):
                 if loaded_messages:
                     st.session_state.session_id = conv['id']
                     st.session_state.messages = loaded_messages
+                    st.session_state.context_summary = load_context_summary(
+                        st.session_state.conversation_store, conv['id']
+                    )
+                    st.session_state.chat_render_window = CHAT_RENDER_WINDOW
                     st.sidebar.success(f"Loaded conversation: {conv['title']}")
                     st.rerun()
                 else:
                     st.sidebar.error("Failed to load conversation")
+
+        newer_col, older_col = st.sidebar.columns(2)
+        if len(st.session_state.conversation_page_cursors) > 1 and newer_col.button("◀ Newer"):
+            st.session_state.conversation_page_cursors.pop()
+            st.rerun()
+        if next_cursor and older_col.button("Older ▶"):
+            st.session_state.conversation_page_cursors.append(next_cursor)
+            st.rerun()
     else:
         st.sidebar.info("No saved conversations yet")
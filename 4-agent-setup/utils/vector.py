@@ -1,19 +1,92 @@
 import os
+import json
+import uuid
+from itertools import islice
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
 from utils.logger import logger
+from utils.store_lock import hold_store_lock
 
-def initialize_embedding_model():
-    """Initialize and return the OpenAI embeddings model."""
-    logger.info("Initializing embedding model")
+def initialize_embedding_model(provider=None):
+    """Initialize and return the embeddings model.
+
+    provider is "openai" (default) or "hashing", the local offline embeddings
+    of utils/local_embeddings.py; EMBEDDING_PROVIDER sets the default.
+    Stores must be built and queried with the same provider.
+    """
+    provider = provider or os.getenv("EMBEDDING_PROVIDER", "openai")
+    logger.info(f"Initializing embedding model ({provider})")
+    if provider == "hashing":
+        from utils.local_embeddings import HashingEmbeddings
+        return HashingEmbeddings()
+    if provider != "openai":
+        raise ValueError(f"Unknown embedding provider: {provider}")
     return OpenAIEmbeddings()
 
-def initialize_vector_store(embedding_model, persist_directory="vector_store", collection_name="documents"):
-    """Initialize vector store for conversation tracking"""
+# Documents embedded and written per call in save_documents_to_store
+WRITE_BATCH_SIZE = int(os.getenv("VECTOR_WRITE_BATCH_SIZE", "500"))
+
+# File in a persist directory mapping collection names to the physical collection in use
+COLLECTION_ALIASES_FILE = "active_collections.json"
+
+def resolve_collection_name(persist_directory, collection_name):
+    """Return the physical collection currently serving collection_name.
+
+    Compaction rebuilds a collection under a new name and then points the
+    alias at it, so new store instances pick up the rebuilt collection.
+    """
+    path = os.path.join(persist_directory, COLLECTION_ALIASES_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get(collection_name, collection_name)
+    except FileNotFoundError:
+        return collection_name
+    except Exception as e:
+        logger.warning(f"Could not read collection aliases in {persist_directory}: {e}")
+        return collection_name
+
+def set_collection_alias(persist_directory, collection_name, physical_name):
+    """Atomically point collection_name at another physical collection."""
+    path = os.path.join(persist_directory, COLLECTION_ALIASES_FILE)
+    aliases = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            aliases = json.load(f)
+    aliases[collection_name] = physical_name
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(aliases, f, indent=2)
+    os.replace(tmp_path, path)
+
+def initialize_vector_store(embedding_model, persist_directory="vector_store", collection_name="documents", backend="chroma"):
+    """Initialize vector store for conversation tracking
+
+    backend selects the implementation: "chroma" (default), "sqlite"
+    (utils/sqlite_store.py, for many concurrent writers) or "numpy"
+    (utils/numpy_store.py, in-process matrix for small-to-medium collections)
+    or "snapshot" (utils/snapshot.py, read-only memory-mapped snapshots).
+    """
     # Create a shared directory for all collections
     os.makedirs(persist_directory, exist_ok=True)
+    # Keeps maintenance commands (clear, snapshot, restore, compaction) off the store while it is open
+    hold_store_lock(persist_directory)
+
+    if backend == "sqlite":
+        from utils.sqlite_store import initialize_sqlite_store
+        return initialize_sqlite_store(embedding_model, persist_directory, collection_name)
+    if backend == "numpy":
+        from utils.numpy_store import initialize_numpy_store
+        return initialize_numpy_store(embedding_model, persist_directory, collection_name)
+    if backend == "snapshot":
+        from utils.snapshot import initialize_snapshot_store
+        return initialize_snapshot_store(embedding_model, persist_directory, collection_name)
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector store backend: {backend}")
+
+    collection_name = resolve_collection_name(persist_directory, collection_name)
 
     # Initialize conversation store for tracking conversation history
     vector_store = Chroma(
@@ -24,23 +97,114 @@ def initialize_vector_store(embedding_model, persist_directory="vector_store", c
     logger.info(f"🗃️ Initialized vector store: {collection_name}")
     return vector_store
 
-def save_document_to_store(vector_store, content, metadata):
-    """Save a document to the vector store with the given content and metadata."""
+def vector_store_key(persist_directory, collection_name, backend="chroma", embedding_provider=None):
+    """Key identifying a vector store in the shared resource registry.
+
+    It names the physical collection the alias resolves to, so stores opened
+    after a compaction are not confused with the ones opened before it.
+    """
+    if backend == "chroma":
+        collection_name = resolve_collection_name(persist_directory, collection_name)
+    provider = embedding_provider or os.getenv("EMBEDDING_PROVIDER", "openai")
+    return ("vector_store", backend, persist_directory, collection_name, provider)
+
+def save_document_to_store(vector_store, content, metadata, doc_id=None):
+    """Save a document to the vector store with the given content and metadata.
+
+    When doc_id is given the document is upserted under that id, replacing any
+    previous document with the same id.
+    """
     try:
-        vector_store.add_documents([
-            Document(page_content=content, metadata=metadata)
-        ])
+        vector_store.add_documents(
+            [Document(page_content=content, metadata=metadata)],
+            ids=[doc_id] if doc_id else None
+        )
         logger.info(f"✅ Document saved successfully to vector store")
         return True
     except Exception as e:
         logger.error(f"Error saving document to vector store: {str(e)}")
         return False
 
-def get_documents_from_store(vector_store, where_filter=None):
-    """Retrieve documents from the vector store based on a filter."""
+def save_documents_to_store(vector_store, items, batch_size=None):
+    """Save many documents, embedding and writing them in batches.
+
+    Each batch is one embedding request and one store write, instead of one
+    of each per document. If a batch fails, its documents are retried one by
+    one so a single bad document does not fail the others.
+
+    Args:
+        vector_store: The vector store to write to
+        items: An iterable of (content, metadata) or (content, metadata, doc_id) tuples;
+            documents with a doc_id are upserted under it
+        batch_size: Documents per batch, WRITE_BATCH_SIZE by default
+
+    Returns:
+        A list of booleans, True for each item that was saved, in input order
+    """
+    batch_size = batch_size or WRITE_BATCH_SIZE
+    items = iter(items)
+    statuses = []
+
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            break
+
+        documents = [Document(page_content=item[0], metadata=item[1]) for item in batch]
+        ids = [item[2] if len(item) > 2 and item[2] else str(uuid.uuid4()) for item in batch]
+        try:
+            vector_store.add_documents(documents, ids=ids)
+            statuses.extend([True] * len(batch))
+        except Exception as e:
+            logger.warning(f"Batch of {len(batch)} documents failed ({e}), saving them one by one")
+            for document, doc_id in zip(documents, ids):
+                try:
+                    vector_store.add_documents([document], ids=[doc_id])
+                    statuses.append(True)
+                except Exception as item_error:
+                    logger.error(f"Error saving document {doc_id} to vector store: {item_error}")
+                    statuses.append(False)
+
+        logger.info(f"✅ Saved {sum(statuses)}/{len(statuses)} documents to vector store so far")
+
+    return statuses
+
+def get_documents_from_store(vector_store, where_filter=None, include=None, limit=None, offset=None,
+                             count_only=False):
+    """Retrieve documents from the vector store based on a filter.
+
+    Args:
+        vector_store: The vector store to read from
+        where_filter: Optional metadata filter
+        include: Fields to return besides the ids, any of "documents",
+            "metadatas" and "embeddings"; [] returns ids only. Defaults to
+            documents and metadatas.
+        limit: Maximum number of records to return
+        offset: Number of matching records to skip
+        count_only: Return only the number of matching records
+
+    Returns:
+        The store's result dict ({"ids": [...], "metadatas": [...], ...}); the
+        record count with count_only; None on error
+    """
     try:
-        results = vector_store.get(where=where_filter)
-        return results
+        if count_only:
+            if where_filter is None:
+                # Counted by the store itself; langchain's Chroma only exposes it on the collection
+                count = getattr(vector_store, "count", None) or vector_store._collection.count
+                return count()
+            # Only the ids of the matching records cross the wire
+            return len(vector_store.get(where=where_filter, include=[])["ids"])
+
+        kwargs = {"where": where_filter}
+        if include is not None:
+            kwargs["include"] = include
+        if limit is not None:
+            kwargs["limit"] = limit
+        if offset:
+            kwargs["offset"] = offset
+
+        return vector_store.get(**kwargs)
     except Exception as e:
         logger.error(f"Error retrieving documents from vector store: {str(e)}")
         return None
@@ -1,7 +1,11 @@
 # import basics
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import traceback
+from typing import List, Optional
 
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain_openai import ChatOpenAI
@@ -9,12 +13,29 @@ from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.tools import tool
 from langchain_community.vectorstores import SupabaseVectorStore
 from langchain_openai import OpenAIEmbeddings
+from langchain_core.documents import Document
 
 from supabase import create_client, Client
 
+from mmr import mmr_select, parse_embedding, MMR_FETCH_K, MMR_LAMBDA
+from embedding_batcher import EmbeddingMicroBatcher
+
 # load environment variables
 load_dotenv()
 
+# Speculative retrieval: search the raw question while the agent's first LLM call runs
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+SPECULATION_MATCH_THRESHOLD = float(os.getenv("SPECULATION_MATCH_THRESHOLD", "0.5"))
+
+# Maximal marginal relevance: over-fetch candidates, then keep a diverse subset
+# (MMR_FETCH_K and MMR_LAMBDA are shared with the evaluation, see mmr.py)
+DIVERSIFY_RESULTS = os.getenv("DIVERSIFY_RESULTS", "false").lower() == "true"
+
+# Query embeddings requested within this window are sent as one batched API call (0 disables)
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+# Batched embedding requests allowed in flight at once
+EMBEDDING_BATCH_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_BATCH_MAX_IN_FLIGHT", "4"))
+
 def log_error(e: Exception, context: str):
     """Log error with context and stack trace."""
     print(f"\n❌ Error in {context}:")
@@ -23,24 +44,153 @@ def log_error(e: Exception, context: str):
     print("\nStack trace:")
     print(traceback.format_exc())
 
-@tool
-def retrieve(query: str) -> str:
-    """Retrieve relevant documents for a query."""
-    try:
-        # Initialize vector store
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        vector_store = SupabaseVectorStore(
-            embedding=embeddings,
-            client=create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_SERVICE_KEY")
-            ),
+_supabase_client = None
+_embeddings = None
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
+def get_vector_store():
+    """Return the Supabase client, embeddings and vector store, created once per process."""
+    global _supabase_client, _embeddings, _vector_store
+    with _vector_store_lock:
+        if _vector_store is not None:
+            return _supabase_client, _embeddings, _vector_store
+
+        _supabase_client = create_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_SERVICE_KEY")
+        )
+        _embeddings = EmbeddingMicroBatcher(
+            OpenAIEmbeddings(model="text-embedding-3-small"),
+            window_ms=EMBEDDING_BATCH_WINDOW_MS,
+            max_in_flight=EMBEDDING_BATCH_MAX_IN_FLIGHT
+        )
+        _vector_store = SupabaseVectorStore(
+            embedding=_embeddings,
+            client=_supabase_client,
             table_name="documents_new",
             query_name="match_documents"
         )
+    return _supabase_client, _embeddings, _vector_store
+
+def match_rows(query_embedding: List[float], count: int, filenames: Optional[List[str]] = None) -> list:
+    """Call match_documents, or match_documents_in_files for a filename scope."""
+    supabase, _, _ = get_vector_store()
+    params = {'query_embedding': query_embedding, 'match_count': count}
+    if filenames:
+        params['filenames'] = list(filenames)
+        return supabase.rpc('match_documents_in_files', params).execute().data or []
+    return supabase.rpc('match_documents', params).execute().data or []
+
+def search_documents(
+    query: str,
+    k: int = 3,
+    filenames: Optional[List[str]] = None,
+    diversify: bool = False
+) -> List[Document]:
+    """Search the document chunks, optionally restricted to a set of filenames.
+
+    Scoped searches go through match_documents_in_files (see partition_setup.sql),
+    which only scans the partitions of the requested files. With diversify, MMR_FETCH_K
+    candidates are fetched with their embeddings and k of them are picked with MMR.
+    """
+    _, embeddings, vector_store = get_vector_store()
+
+    if not filenames and not diversify:
+        return vector_store.similarity_search(query, k=k)
+
+    query_embedding = embeddings.embed_query(query)
+    rows = match_rows(query_embedding, max(MMR_FETCH_K, k) if diversify else k, filenames)
+
+    if diversify and len(rows) > k:
+        selected = mmr_select(
+            query_embedding,
+            [parse_embedding(row["embedding"]) for row in rows],
+            k,
+            MMR_LAMBDA
+        )
+        rows = [rows[i] for i in selected]
+
+    return [
+        Document(page_content=row["content"], metadata=row.get("metadata") or {})
+        for row in rows
+    ]
 
-        # Perform similarity search
-        results = vector_store.similarity_search(query, k=3)
+_speculation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative-retrieval")
+_speculation_lock = threading.Lock()
+_speculation = None
+
+def query_terms(text: str) -> set:
+    """Lowercased word set of a query, used to compare tool queries with the question."""
+    return set(re.findall(r"\w+", text.lower()))
+
+def query_overlap(a: str, b: str) -> float:
+    """Jaccard overlap between the word sets of two queries."""
+    terms_a, terms_b = query_terms(a), query_terms(b)
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+def start_speculative_retrieval(question: str):
+    """Start embedding and searching the raw question in the background."""
+    global _speculation
+    future = _speculation_executor.submit(search_documents, question, 3, None, DIVERSIFY_RESULTS)
+    with _speculation_lock:
+        if _speculation is not None:
+            _speculation["future"].cancel()
+        _speculation = {"query": question, "future": future, "diversify": DIVERSIFY_RESULTS}
+
+def clear_speculative_retrieval():
+    """Drop any speculative result that was not used by the agent."""
+    global _speculation
+    with _speculation_lock:
+        if _speculation is not None:
+            _speculation["future"].cancel()
+        _speculation = None
+
+def take_speculative_results(
+    query: str,
+    filenames: Optional[List[str]] = None,
+    diversify: bool = False
+) -> Optional[List[Document]]:
+    """Hand over the speculative results if the tool query matches the question closely enough.
+
+    The speculation is consumed on first use. Scoped queries never match because
+    the speculative search covers the whole corpus.
+    """
+    global _speculation
+    with _speculation_lock:
+        speculation, _speculation = _speculation, None
+
+    if speculation is None or filenames or speculation["diversify"] != diversify:
+        return None
+
+    overlap = query_overlap(query, speculation["query"])
+    if overlap < SPECULATION_MATCH_THRESHOLD:
+        print(f"Speculative retrieval discarded (overlap {overlap:.2f})")
+        speculation["future"].cancel()
+        return None
+
+    try:
+        results = speculation["future"].result()
+        print(f"⚡ Using speculative retrieval (overlap {overlap:.2f})")
+        return results
+    except Exception as e:
+        log_error(e, "Speculative retrieval")
+        return None
+
+@tool
+def retrieve(query: str, filenames: Optional[List[str]] = None, diversify: bool = DIVERSIFY_RESULTS) -> str:
+    """Retrieve relevant documents for a query.
+
+    Pass filenames (e.g. ["Tourisme 2030 Maroc.pdf"]) to only search those documents.
+    Set diversify to true to get results spread across different pages and documents.
+    """
+    try:
+        # Reuse the speculative search of the question when it matches, else search now
+        results = take_speculative_results(query, filenames, diversify)
+        if results is None:
+            results = search_documents(query, k=3, filenames=filenames, diversify=diversify)
 
         if not results:
             return "No relevant documents found."
@@ -80,6 +230,7 @@ def create_agent():
              2. Provide a concise answer based on the documents
              3. Cite your sources
              4. If you're unsure, say so
+             If the user asks about specific documents, pass their filenames to the retrieve tool.
              """),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad"),
@@ -121,6 +272,9 @@ def main():
                 continue
 
             try:
+                if SPECULATIVE_RETRIEVAL:
+                    start_speculative_retrieval(query)
+
                 response = agent.invoke({"input": query})
                 print("\nResponse:", response['output'])
 
@@ -128,6 +282,9 @@ def main():
                 log_error(e, "Query processing")
                 continue
 
+            finally:
+                clear_speculative_retrieval()
+
     except Exception as e:
         log_error(e, "Main execution")
         raise
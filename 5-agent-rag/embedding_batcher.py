@@ -0,0 +1,101 @@
+# import basics
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+class EmbeddingMicroBatcher(Embeddings):
+    """Coalesce concurrent embed_query calls into batched embedding requests.
+
+    Each embed_query call is queued. A collector thread gathers the requests
+    that arrive within window_ms of the first one (up to max_batch_size) and
+    hands them to a pool that sends each batch as a single embed_documents
+    call, so up to max_in_flight requests run at once while the next window
+    fills. Every caller gets its own vector; identical texts within a batch
+    are embedded once.
+
+    Batching sends queries through embed_documents, which is only right for
+    models that embed a query like a document (OpenAI). Pass
+    queries_as_documents=False for models that embed queries differently
+    (instruction prefixes, input types); their queries go to embed_query
+    directly.
+    """
+
+    def __init__(self, embeddings: Embeddings, window_ms: float = 5.0, max_batch_size: int = 64,
+                 max_in_flight: int = 4, queries_as_documents: bool = True):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.queries_as_documents = queries_as_documents
+        self._queue = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embedding-request")
+        self._stats_lock = threading.Lock()
+        self._stats = {"queries": 0, "requests": 0, "largest_batch": 0}
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed one query, sharing the API request with concurrent callers."""
+        if self.window <= 0 or not self.queries_as_documents:
+            self._record(1, 1)
+            return self.embeddings.embed_query(text)
+
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Document lists are already batched, so they go straight to the wrapped model."""
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> dict:
+        """Return request counters: queries received vs embedding requests sent."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _record(self, queries: int, batch_size: int):
+        with self._stats_lock:
+            self._stats["queries"] += queries
+            self._stats["requests"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], batch_size)
+
+    def _collect_batch(self) -> list:
+        """Block for the first request, then gather the ones arriving within the window."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Wait for a free request slot; meanwhile new queries queue up for the next batch
+            self._slots.acquire()
+            batch = self._collect_batch()
+            self._pool.submit(self._embed_batch, batch)
+
+    def _embed_batch(self, batch: list):
+        try:
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+            self._record(len(batch), len(texts))
+            for text, future in batch:
+                future.set_result(vectors[text])
+        finally:
+            self._slots.release()
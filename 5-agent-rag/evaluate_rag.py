@@ -0,0 +1,300 @@
+# import basics
+import os
+import sys
+import json
+import math
+import time
+import argparse
+from datetime import datetime
+from dotenv import load_dotenv
+import traceback
+
+from langchain_community.vectorstores import SupabaseVectorStore
+from langchain_openai import OpenAIEmbeddings
+from supabase import create_client, Client
+
+from mmr import mmr_select, parse_embedding, MMR_FETCH_K, MMR_LAMBDA
+
+# load environment variables
+load_dotenv()
+
+DEFAULT_K_VALUES = [1, 3, 5, 10]
+DEFAULT_METHODS = ["match_documents", "match_documents:mmr", "retriever:similarity", "retriever:mmr"]
+
+def log_error(e: Exception, context: str):
+    """Log error with context and stack trace."""
+    print(f"\n❌ Error in {context}:", file=sys.stderr)
+    print(f"Error type: {type(e).__name__}", file=sys.stderr)
+    print(f"Error message: {str(e)}", file=sys.stderr)
+    print("\nStack trace:", file=sys.stderr)
+    print(traceback.format_exc(), file=sys.stderr)
+
+def log_message(message: str):
+    """Print a progress message on stderr so stdout stays machine-readable."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}", file=sys.stderr)
+
+def load_query_set(path: str) -> list:
+    """Load a labelled query set.
+
+    The file is JSON with a top-level "queries" list. Each entry has a
+    "query" string and a "relevant" list of labels; a label is either a
+    filename string or an object with "filename" and an optional "page".
+    An optional "filenames" list scopes the query for the partitioned search.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    queries = data["queries"] if isinstance(data, dict) else data
+    labelled = []
+    for entry in queries:
+        labels = []
+        for label in entry.get("relevant", []):
+            if isinstance(label, str):
+                label = {"filename": label}
+            labels.append({
+                "filename": label["filename"],
+                "page": None if label.get("page") is None else str(label["page"]),
+            })
+        if not labels:
+            log_message(f"Skipping unlabelled query: {entry.get('query', '')[:50]}")
+            continue
+        labelled.append({
+            "query": entry["query"],
+            "relevant": labels,
+            "filenames": entry.get("filenames") or [],
+        })
+    return labelled
+
+def matches_label(metadata: dict, label: dict) -> bool:
+    """Check whether a retrieved document's metadata satisfies a relevance label."""
+    metadata = metadata or {}
+    if metadata.get("filename") != label["filename"]:
+        return False
+    if label["page"] is None:
+        return True
+    return str(metadata.get("page")) == label["page"]
+
+def score_results(metadatas: list, labels: list, k: int) -> dict:
+    """Compute recall@k and reciprocal rank for one ranked result list."""
+    top = metadatas[:k]
+
+    found = sum(1 for label in labels if any(matches_label(m, label) for m in top))
+    recall = found / len(labels)
+
+    reciprocal_rank = 0.0
+    for rank, metadata in enumerate(top, 1):
+        if any(matches_label(metadata, label) for label in labels):
+            reciprocal_rank = 1.0 / rank
+            break
+
+    return {"recall": recall, "reciprocal_rank": reciprocal_rank}
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def latency_summary(samples_ms: list) -> dict:
+    """Summarize latency samples in milliseconds."""
+    return {
+        "samples": len(samples_ms),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 2) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 2),
+        "p95_ms": round(percentile(samples_ms, 95), 2),
+        "p99_ms": round(percentile(samples_ms, 99), 2),
+    }
+
+def initialize_connections():
+    """Initialize the Supabase client, embeddings and vector store."""
+    if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_SERVICE_KEY"):
+        raise ValueError("Missing Supabase credentials in .env file")
+
+    supabase: Client = create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY")
+    )
+    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    vector_store = SupabaseVectorStore(
+        embedding=embeddings,
+        client=supabase,
+        table_name="documents_new",
+        query_name="match_documents"
+    )
+    return supabase, embeddings, vector_store
+
+def run_match_documents(supabase: Client, query_embedding: list, k: int) -> list:
+    """Call the match_documents SQL function and return result metadata in rank order."""
+    result = supabase.rpc(
+        'match_documents',
+        {
+            'query_embedding': query_embedding,
+            'match_count': k
+        }
+    ).execute()
+    return [row.get("metadata") or {} for row in result.data or []]
+
+def run_match_documents_in_files(supabase: Client, query_embedding: list, k: int, filenames: list) -> list:
+    """Call the partition-pruned match_documents_in_files SQL function."""
+    if not filenames:
+        return run_match_documents(supabase, query_embedding, k)
+    result = supabase.rpc(
+        'match_documents_in_files',
+        {
+            'query_embedding': query_embedding,
+            'filenames': filenames,
+            'match_count': k
+        }
+    ).execute()
+    return [row.get("metadata") or {} for row in result.data or []]
+
+def run_match_documents_mmr(supabase: Client, query_embedding: list, k: int) -> list:
+    """Over-fetch with match_documents, then keep k diverse results with vectorized MMR."""
+    result = supabase.rpc(
+        'match_documents',
+        {
+            'query_embedding': query_embedding,
+            'match_count': max(MMR_FETCH_K, k)
+        }
+    ).execute()
+    rows = result.data or []
+    selected = mmr_select(query_embedding, [parse_embedding(row["embedding"]) for row in rows], k, MMR_LAMBDA)
+    return [rows[i].get("metadata") or {} for i in selected]
+
+def run_retriever(vector_store: SupabaseVectorStore, query: str, k: int, search_type: str) -> list:
+    """Run the LangChain retriever and return result metadata in rank order."""
+    search_kwargs = {"k": k}
+    if search_type == "mmr":
+        # Same candidate pool and trade-off as the match_documents:mmr path
+        search_kwargs.update(fetch_k=max(MMR_FETCH_K, k), lambda_mult=MMR_LAMBDA)
+    retriever = vector_store.as_retriever(
+        search_type=search_type,
+        search_kwargs=search_kwargs
+    )
+    return [doc.metadata for doc in retriever.invoke(query)]
+
+def evaluate(query_set: list, methods: list, k_values: list, repeat: int = 1) -> dict:
+    """Evaluate every method/k combination over the labelled query set."""
+    supabase, embeddings, vector_store = initialize_connections()
+
+    # Embed each query once for the direct SQL path so its latency is search-only
+    log_message(f"Embedding {len(query_set)} queries...")
+    query_embeddings = {}
+    embedding_latencies = []
+    for item in query_set:
+        start = time.perf_counter()
+        query_embeddings[item["query"]] = embeddings.embed_query(item["query"])
+        embedding_latencies.append((time.perf_counter() - start) * 1000)
+
+    runs = []
+    for method in methods:
+        for k in k_values:
+            log_message(f"Evaluating {method} with k={k}...")
+            latencies = []
+            recalls = []
+            reciprocal_ranks = []
+            per_query = []
+
+            for item in query_set:
+                metadatas = []
+                for _ in range(max(1, repeat)):
+                    start = time.perf_counter()
+                    if method == "match_documents":
+                        metadatas = run_match_documents(supabase, query_embeddings[item["query"]], k)
+                    elif method == "match_documents:mmr":
+                        metadatas = run_match_documents_mmr(supabase, query_embeddings[item["query"]], k)
+                    elif method == "match_documents_in_files":
+                        metadatas = run_match_documents_in_files(
+                            supabase, query_embeddings[item["query"]], k, item["filenames"]
+                        )
+                    elif method.startswith("retriever:"):
+                        metadatas = run_retriever(vector_store, item["query"], k, method.split(":", 1)[1])
+                    else:
+                        raise ValueError(f"Unknown method: {method}")
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                scores = score_results(metadatas, item["relevant"], k)
+                recalls.append(scores["recall"])
+                reciprocal_ranks.append(scores["reciprocal_rank"])
+                per_query.append({
+                    "query": item["query"],
+                    "recall": scores["recall"],
+                    "reciprocal_rank": scores["reciprocal_rank"],
+                    "retrieved": [
+                        {"filename": m.get("filename"), "page": m.get("page")} for m in metadatas
+                    ],
+                })
+
+            runs.append({
+                "method": method,
+                "k": k,
+                "recall@k": round(sum(recalls) / len(recalls), 4),
+                "mrr": round(sum(reciprocal_ranks) / len(reciprocal_ranks), 4),
+                "latency": latency_summary(latencies),
+                "queries": per_query,
+            })
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "query_count": len(query_set),
+        "repeat": repeat,
+        "embedding_latency": latency_summary(embedding_latencies),
+        "runs": runs,
+    }
+
+def compare_reports(report: dict, baseline: dict) -> list:
+    """Compute per-run metric deltas against a baseline report."""
+    baseline_runs = {(run["method"], run["k"]): run for run in baseline.get("runs", [])}
+    deltas = []
+    for run in report["runs"]:
+        previous = baseline_runs.get((run["method"], run["k"]))
+        if not previous:
+            continue
+        deltas.append({
+            "method": run["method"],
+            "k": run["k"],
+            "recall@k": round(run["recall@k"] - previous["recall@k"], 4),
+            "mrr": round(run["mrr"] - previous["mrr"], 4),
+            "p50_ms": round(run["latency"]["p50_ms"] - previous["latency"]["p50_ms"], 2),
+            "p95_ms": round(run["latency"]["p95_ms"] - previous["latency"]["p95_ms"], 2),
+            "p99_ms": round(run["latency"]["p99_ms"] - previous["latency"]["p99_ms"], 2),
+        })
+    return deltas
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency on a labelled query set.")
+    parser.add_argument("query_set", help="Path to the labelled query set (JSON)")
+    parser.add_argument("--k", type=int, nargs="+", default=DEFAULT_K_VALUES, help="k values to evaluate")
+    parser.add_argument("--methods", nargs="+", default=DEFAULT_METHODS, help="Retrieval methods to evaluate")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per query for latency sampling")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        args = parse_args()
+        query_set = load_query_set(args.query_set)
+        if not query_set:
+            raise ValueError(f"No labelled queries found in {args.query_set}")
+
+        report = evaluate(query_set, args.methods, args.k, args.repeat)
+
+        if args.baseline:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                report["delta_vs_baseline"] = compare_reports(report, json.load(f))
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(output)
+            log_message(f"Report written to {args.output}")
+        else:
+            print(output)
+
+    except Exception as e:
+        log_error(e, "Main execution")
+        raise
@@ -160,6 +160,19 @@ def process_pdf(file_path: str):
         log_error(e, f"Processing PDF: {file_path}")
         return []
 
+def ensure_partition(supabase: Client, filename: str) -> bool:
+    """Create the filename partition of documents_new if the table is partitioned.
+
+    Returns False when partition_setup.sql has not been applied, in which case
+    rows are inserted without the filename column.
+    """
+    try:
+        supabase.rpc('ensure_document_partition', {'p_filename': filename}).execute()
+        return True
+    except Exception as e:
+        log_message(f"Partitioning not available, inserting {filename} unpartitioned ({e})")
+        return False
+
 def ingest_documents():
     """Ingest documents into the database."""
     try:
@@ -188,6 +201,7 @@ def ingest_documents():
                 continue
 
             print(f"\nProcessing {pdf_file} - {len(chunks)} chunks")
+            partitioned = ensure_partition(supabase, pdf_file)
 
             # Process chunks in batches
             batch_size = 10
@@ -210,6 +224,8 @@ def ingest_documents():
                         },
                         'embedding': embedding
                     }
+                    if partitioned:
+                        doc['filename'] = pdf_file
                     documents.append(doc)
 
                 # Insert batch
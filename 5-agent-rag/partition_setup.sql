@@ -0,0 +1,135 @@
+-- Partition documents_new by filename so that document-scoped queries only
+-- search the partitions of the requested files.
+-- Run after migration.sql. Safe to run once on an existing documents_new table.
+
+-- 1. Keep the current (unpartitioned) table around while the data is copied
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'documents_new' AND relkind = 'r') THEN
+        ALTER TABLE documents_new RENAME TO documents_new_unpartitioned;
+        ALTER INDEX IF EXISTS documents_new_embedding_idx RENAME TO documents_new_unpartitioned_embedding_idx;
+    END IF;
+END $$;
+
+-- 2. Create the partitioned table, one list partition per filename
+CREATE TABLE IF NOT EXISTS documents_new (
+    id bigserial,
+    filename text NOT NULL DEFAULT '',
+    content text,
+    metadata jsonb,
+    embedding vector(1536),
+    PRIMARY KEY (filename, id)
+) PARTITION BY LIST (filename);
+
+-- Rows inserted without a filename (or before their partition exists) land here
+CREATE TABLE IF NOT EXISTS documents_new_default
+PARTITION OF documents_new DEFAULT;
+
+-- 3. Function creating the partition (and its vector index) for a filename
+CREATE OR REPLACE FUNCTION ensure_document_partition(p_filename text)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    partition_name text := 'documents_new_p_' || substr(md5(p_filename), 1, 16);
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Build the partition detached, move any rows parked in the default
+    -- partition into it, then attach it
+    EXECUTE format('CREATE TABLE %I (LIKE documents_new INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM documents_new_default WHERE filename = %L RETURNING *)
+         INSERT INTO %I SELECT * FROM moved',
+        p_filename, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE documents_new ATTACH PARTITION %I FOR VALUES IN (%L)',
+        partition_name, p_filename
+    );
+
+    -- HNSW works well on small partitions, where ivfflat lists would be mostly empty
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON %I USING hnsw (embedding vector_cosine_ops)',
+        partition_name || '_embedding_idx', partition_name
+    );
+
+    RETURN partition_name;
+END;
+$$;
+
+-- 4. Create partitions for the existing files and copy the data
+DO $$
+DECLARE
+    fname text;
+BEGIN
+    IF to_regclass('documents_new_unpartitioned') IS NULL THEN
+        RETURN;
+    END IF;
+
+    FOR fname IN
+        SELECT DISTINCT COALESCE(metadata->>'filename', '') FROM documents_new_unpartitioned
+    LOOP
+        IF fname <> '' THEN
+            PERFORM ensure_document_partition(fname);
+        END IF;
+    END LOOP;
+
+    INSERT INTO documents_new (id, filename, content, metadata, embedding)
+    SELECT id, COALESCE(metadata->>'filename', ''), content, metadata, embedding
+    FROM documents_new_unpartitioned
+    ON CONFLICT DO NOTHING;
+
+    PERFORM setval(
+        pg_get_serial_sequence('documents_new', 'id'),
+        GREATEST((SELECT COALESCE(MAX(id), 0) FROM documents_new), 1)
+    );
+END $$;
+
+-- 5. Search restricted to a set of files. The filename predicate lets the
+-- planner prune every other partition, so latency follows partition size.
+CREATE OR REPLACE FUNCTION match_documents_in_files (
+    query_embedding vector(1536),
+    filenames text[],
+    match_count int DEFAULT null,
+    filter jsonb DEFAULT '{}'
+) RETURNS TABLE (
+    id bigint,
+    content text,
+    metadata jsonb,
+    embedding jsonb,
+    similarity float
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    SELECT
+        id,
+        content,
+        metadata,
+        (embedding::text)::jsonb as embedding,
+        1 - (documents_new.embedding <=> query_embedding) as similarity
+    FROM documents_new
+    WHERE documents_new.filename = ANY(filenames)
+      AND metadata @> filter
+    ORDER BY documents_new.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- 6. Verify the partitioning
+DO $$
+BEGIN
+    RAISE NOTICE 'Partitions: %', (
+        SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'documents_new'::regclass
+    );
+    RAISE NOTICE 'Rows in default partition: %', (SELECT COUNT(*) FROM documents_new_default);
+    RAISE NOTICE 'Rows in documents_new: %', (SELECT COUNT(*) FROM documents_new);
+END $$;
+
+-- 7. Optional: drop the old table once everything looks good
+-- DROP TABLE IF EXISTS documents_new_unpartitioned;
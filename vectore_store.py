@@ -1,6 +1,8 @@
 import os
+import json
 import uuid
 import logging
+import numpy as np
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from openai import OpenAI, APIError # Use OpenAI v1+ library
@@ -27,6 +29,8 @@ OPENAI_EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS", 1536)
 OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo")
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 150))
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", 20)) # Candidates fetched before MMR diversification
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.5)) # 1.0 = pure relevance, 0.0 = pure diversity
 
 # --- Input Validation ---
 if not all([OPENAI_API_KEY, SUPABASE_URL, SUPABASE_SERVICE_KEY]):
@@ -86,6 +90,32 @@ def _summarize_text(text: str, prompt_detail: str = "Provide a concise summary",
     return None
 
 
+def _mmr_select(query_embedding: List[float], candidate_embeddings: List[List[float]], k: int, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """Selects k diverse candidate indices with maximal marginal relevance (vectorized with NumPy)."""
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or candidates.shape[0] == 0 or k <= 0:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12) # Not in place: leaves the caller's embedding untouched
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+
+    relevance = candidates @ query
+    selected = [int(np.argmax(relevance))]
+    max_similarity = candidates @ candidates[selected[0]] # Running max similarity to the selection
+    available = np.ones(candidates.shape[0], dtype=bool)
+    available[selected[0]] = False
+
+    # Only loops k times; each step is a single matrix-vector product over all candidates
+    while len(selected) < min(k, candidates.shape[0]):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        available[chosen] = False
+        np.maximum(max_similarity, candidates @ candidates[chosen], out=max_similarity)
+    return selected
+
+
 def _load_and_split_document(source: str, source_type: str = 'file') -> List[LangchainDocument]:
     """Loads and splits a document from file or URL."""
     loader = None
@@ -288,11 +318,58 @@ def get_document(document_id: str) -> Optional[Dict[str, Any]]:
         return None
 
 
+def query_vector_store(
+    query_text: str,
+    top_k: int = 5,
+    match_threshold: float = 0.75,
+    filenames: Optional[List[str]] = None,
+    diversify: bool = False
+    ) -> List[Dict[str, Any]]:
+    """
+    Embeds the query and returns the most similar chunks above the similarity threshold.
+
+    When filenames is given, the search is restricted to those files through
+    match_documents_in_files, which only scans their partitions. With diversify,
+    MMR_FETCH_K candidates are fetched and top_k diverse ones are kept (MMR).
+    """
+    query_embedding = _get_openai_embedding(query_text)
+    if query_embedding is None:
+        logging.error("Could not embed query, skipping vector search.")
+        return []
+
+    match_count = max(MMR_FETCH_K, top_k) if diversify else top_k
+    params = {"query_embedding": query_embedding, "match_count": match_count}
+    if filenames:
+        params["filenames"] = list(filenames)
+        response = supabase.rpc("match_documents_in_files", params).execute()
+    else:
+        response = supabase.rpc("match_documents", params).execute()
+
+    rows = [row for row in response.data or [] if (row.get("similarity") or 0.0) >= match_threshold]
+
+    if diversify and len(rows) > top_k:
+        embeddings = [json.loads(row["embedding"]) if isinstance(row["embedding"], str) else row["embedding"] for row in rows]
+        rows = [rows[i] for i in _mmr_select(query_embedding, embeddings, top_k)]
+
+    chunks = []
+    for row in rows:
+        chunks.append({
+            "id": row.get("id"),
+            "chunk_text": row.get("content", ""),
+            "metadata": row.get("metadata") or {},
+            "similarity": row.get("similarity") or 0.0,
+        })
+    logging.info(f"Vector search returned {len(chunks)} chunks above threshold {match_threshold}.")
+    return chunks
+
+
 def query_with_llm(
     query_text: str,
     top_k: int = 5,
     match_threshold: float = 0.75,
-    rerank: bool = False # Placeholder for future reranking logic
+    rerank: bool = False, # Placeholder for future reranking logic
+    filenames: Optional[List[str]] = None, # Restrict the search to these files
+    diversify: bool = False # Pick diverse chunks with MMR instead of the plain top_k
     ) -> Optional[str]:
     """
     Queries the vector store, retrieves chunks, and uses an LLM to generate an answer.
@@ -300,7 +377,7 @@ def query_with_llm(
     logging.info(f"Starting LLM query for: '{query_text[:50]}...'")
     try:
         # 1. Retrieve relevant chunks
-        relevant_chunks = query_vector_store(query_text, top_k, match_threshold)
+        relevant_chunks = query_vector_store(query_text, top_k, match_threshold, filenames, diversify)
 
         if not relevant_chunks:
             logging.warning("No relevant context found in vector store for the query.")